@@ -0,0 +1,467 @@
+"""
+Deterministic stand-ins for Groq, DuckDuckGo and Supabase, so the API
+can be measured offline. install() must run before `main` is imported.
+"""
+import asyncio
+import itertools
+import json
+import sys
+import threading
+import time
+import types
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Iterator
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+# =========================
+# CONFIG
+# =========================
+
+# A user message starting with this makes the fake model call search_the_web
+SEARCH_PREFIX = "search:"
+
+_calls = itertools.count()
+
+
+# =========================
+# FAKE CHAT MODEL
+# =========================
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model with a fixed time to first token and token rate.
+
+    stall_ratio of the calls (spread evenly) take stall_seconds longer to
+    start, like a stalled upstream response.
+
+    Replies are deterministic. A user message starting with SEARCH_PREFIX
+    first gets a search_the_web tool call, then a normal reply once the
+    tool result is in.
+    """
+
+    latency_seconds: float = 0.2
+    tokens_per_second: float = 200.0
+    reply_tokens: int = 40
+    stall_ratio: float = 0.0
+    stall_seconds: float = 5.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _plan(self, messages: list[BaseMessage]) -> tuple[list[str], list[dict]]:
+        """
+        (reply tokens, tool calls) for a prompt.
+        """
+        last = messages[-1]
+
+        if last.type == "human" and isinstance(last.content, str) and last.content.startswith(SEARCH_PREFIX):
+            query = last.content[len(SEARCH_PREFIX):].strip()
+            return [], [{"name": "search_the_web", "args": {"query": query}, "id": f"call_{id(last)}"}]
+
+        seed = len(messages)
+        return [f"word{(seed + i) % 97} " for i in range(self.reply_tokens)], []
+
+    def _usage(self, messages: list[BaseMessage], tokens: list[str]) -> dict:
+        prompt_chars = sum(len(str(m.content)) for m in messages)
+        return {
+            "input_tokens": prompt_chars // 4,
+            "output_tokens": len(tokens),
+            "total_tokens": prompt_chars // 4 + len(tokens),
+        }
+
+    def _message(self, messages, tokens, tool_calls) -> AIMessage:
+        return AIMessage(
+            content="".join(tokens),
+            tool_calls=tool_calls,
+            usage_metadata=self._usage(messages, tokens)
+        )
+
+    def _latency(self) -> float:
+        n = next(_calls)
+
+        if int((n + 1) * self.stall_ratio) > int(n * self.stall_ratio):
+            return self.latency_seconds + self.stall_seconds
+
+        return self.latency_seconds
+
+    def _duration(self, tokens: list[str]) -> float:
+        return self._latency() + len(tokens) / self.tokens_per_second
+
+    def _generate(self, messages, stop=None, run_manager: CallbackManagerForLLMRun | None = None, **kwargs) -> ChatResult:
+        tokens, tool_calls = self._plan(messages)
+        time.sleep(self._duration(tokens))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, tokens, tool_calls))])
+
+    async def _agenerate(self, messages, stop=None, run_manager: AsyncCallbackManagerForLLMRun | None = None, **kwargs) -> ChatResult:
+        tokens, tool_calls = self._plan(messages)
+        await asyncio.sleep(self._duration(tokens))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, tokens, tool_calls))])
+
+    def _chunks(self, messages, tokens, tool_calls) -> list[AIMessageChunk]:
+        if tool_calls:
+            return [AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                    for i, c in enumerate(tool_calls)
+                ],
+                usage_metadata=self._usage(messages, tokens)
+            )]
+
+        chunks = [AIMessageChunk(content=token) for token in tokens]
+        chunks[-1].usage_metadata = self._usage(messages, tokens)
+        return chunks
+
+    def _stream(self, messages, stop=None, run_manager: CallbackManagerForLLMRun | None = None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        tokens, tool_calls = self._plan(messages)
+        time.sleep(self._latency())
+
+        for chunk in self._chunks(messages, tokens, tool_calls):
+            time.sleep(1 / self.tokens_per_second)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop=None, run_manager: AsyncCallbackManagerForLLMRun | None = None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        tokens, tool_calls = self._plan(messages)
+        await asyncio.sleep(self._latency())
+
+        for chunk in self._chunks(messages, tokens, tool_calls):
+            await asyncio.sleep(1 / self.tokens_per_second)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+
+# =========================
+# FAKE SEARCH
+# =========================
+
+def make_fake_search(latency_seconds: float):
+    """
+    Replacement for web_search._run_search with a fixed latency.
+    """
+    def _run_search(query: str) -> str:
+        time.sleep(latency_seconds)
+        return "\n".join(
+            f"Result {i} for {query}: lorem ipsum dolor sit amet" for i in range(3)
+        )
+
+    return _run_search
+
+
+# =========================
+# IN-MEMORY TABLES
+# =========================
+
+def _split_top_level(text: str) -> list[str]:
+    parts, depth, quoted, current = [], 0, False, ""
+
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and ch == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        current += ch
+
+    parts.append(current)
+    return parts
+
+
+def _compare(value, op: str, raw: str) -> bool:
+    raw = raw.strip('"')
+
+    if op == "is":
+        return value is None if raw == "null" else str(value).lower() == raw
+
+    if value is None:
+        return False
+
+    if isinstance(value, bool):
+        target = raw == "true"
+    elif isinstance(value, int):
+        target = int(raw)
+    else:
+        target = raw
+
+    return {
+        "eq": value == target,
+        "lt": value < target,
+        "gt": value > target,
+        "lte": value <= target,
+        "gte": value >= target,
+    }[op]
+
+
+def _parse_or(text: str):
+    """
+    Predicate for a PostgREST or_() string (terms and and(...) groups).
+    """
+    def term(expr: str):
+        if expr.startswith("and(") and expr.endswith(")"):
+            inner = [term(p) for p in _split_top_level(expr[4:-1])]
+            return lambda row: all(p(row) for p in inner)
+
+        column, op, raw = expr.split(".", 2)
+        return lambda row: _compare(row.get(column), op, raw)
+
+    terms = [term(p) for p in _split_top_level(text)]
+    return lambda row: any(t(row) for t in terms)
+
+
+class Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class Query:
+    """
+    The subset of the postgrest query builder the app uses.
+    """
+
+    def __init__(self, store: "InMemoryStore", table: str):
+        self.store = store
+        self.table = table
+        self.op = "select"
+        self.payload = None
+        self.filters = []
+        self.orders = []
+        self.max_rows = None
+
+    def select(self, columns: str = "*", count=None):
+        self.op = "select"
+        return self
+
+    def insert(self, payload):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, **kwargs):
+        self.op, self.payload = "upsert", payload
+        return self
+
+    def update(self, payload):
+        self.op, self.payload = "update", payload
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] > value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] < value)
+        return self
+
+    def or_(self, filters: str):
+        self.filters.append(_parse_or(filters))
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, n):
+        self.max_rows = n
+        return self
+
+    def run(self) -> Result:
+        with self.store.lock:
+            return Result(self.store.execute(self))
+
+
+class AsyncQuery(Query):
+    async def execute(self) -> Result:
+        return self.run()
+
+
+class SyncQuery(Query):
+    def execute(self) -> Result:
+        return self.run()
+
+
+class RPC:
+    def __init__(self, store: "InMemoryStore", name: str, params: dict):
+        self.store, self.name, self.params = store, name, params
+
+    def run(self) -> Result:
+        with self.store.lock:
+            return Result(self.store.rpc(self.name, self.params))
+
+
+class AsyncRPC(RPC):
+    async def execute(self) -> Result:
+        return self.run()
+
+
+class SyncRPC(RPC):
+    def execute(self) -> Result:
+        return self.run()
+
+
+class InMemoryStore:
+    """
+    chat_messages / chat_summaries / chat_threads held in memory, with the
+    chat_threads trigger and the get_thread_context RPC of the migrations.
+    """
+
+    KEYS = {"chat_summaries": "thread_id", "chat_threads": "thread_id"}
+
+    def __init__(self):
+        self.tables: dict[str, list[dict]] = {"chat_messages": [], "chat_summaries": [], "chat_threads": []}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def _now(self) -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def _on_message(self, row: dict):
+        threads = self.tables["chat_threads"]
+        thread = next((t for t in threads if t["thread_id"] == row["thread_id"]), None)
+
+        if thread is None:
+            threads.append({
+                "thread_id": row["thread_id"],
+                "title": row["content"][:80] if row["sender"] == "user" else None,
+                "message_count": 1,
+                "last_activity_at": row["created_at"],
+            })
+        else:
+            thread["message_count"] += 1
+            thread["last_activity_at"] = max(thread["last_activity_at"], row["created_at"])
+
+    def execute(self, query: Query) -> list[dict]:
+        rows = self.tables.setdefault(query.table, [])
+
+        if query.op in ("insert", "upsert"):
+            payload = query.payload if isinstance(query.payload, list) else [query.payload]
+            stored = []
+
+            for new in payload:
+                row = {"id": next(self.ids), "created_at": self._now(), **new}
+                key = self.KEYS.get(query.table)
+
+                if query.op == "upsert" and key:
+                    rows[:] = [r for r in rows if r.get(key) != row[key]]
+
+                rows.append(row)
+                stored.append(dict(row))
+
+                if query.table == "chat_messages":
+                    self._on_message(row)
+
+            return stored
+
+        selected = [r for r in rows if all(f(r) for f in query.filters)]
+
+        if query.op == "update":
+            for row in selected:
+                row.update(query.payload)
+            return [dict(r) for r in selected]
+
+        for column, desc in reversed(query.orders):
+            selected.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+
+        if query.max_rows is not None:
+            selected = selected[:query.max_rows]
+
+        return [dict(r) for r in selected]
+
+    def rpc(self, name: str, params: dict):
+        if name != "get_thread_context":
+            raise NotImplementedError(name)
+
+        thread_id = params["p_thread_id"]
+        summary = next((r for r in self.tables["chat_summaries"] if r["thread_id"] == thread_id), None)
+        thread = next((r for r in self.tables["chat_threads"] if r["thread_id"] == thread_id), None)
+        messages = [
+            {k: r[k] for k in ("id", "sender", "content", "created_at")}
+            for r in sorted(self.tables["chat_messages"], key=lambda r: (r["created_at"], r["id"]))
+            if r["thread_id"] == thread_id and r.get("approved") is not False
+        ]
+
+        return {
+            "summary": summary["summary"] if summary else None,
+            "message_count": thread["message_count"] if thread else 0,
+            "messages": messages[-params.get("p_limit", 6):],
+        }
+
+
+class FakeSupabase:
+    def __init__(self, store: InMemoryStore, asynchronous: bool):
+        self.store = store
+        self.asynchronous = asynchronous
+
+    def table(self, name: str) -> Query:
+        return (AsyncQuery if self.asynchronous else SyncQuery)(self.store, name)
+
+    def rpc(self, name: str, params: dict) -> RPC:
+        return (AsyncRPC if self.asynchronous else SyncRPC)(self.store, name, params)
+
+
+# =========================
+# INSTALL
+# =========================
+
+def install(llm_latency_seconds: float = 0.2,
+    tokens_per_second: float = 200.0,
+    reply_tokens: int = 40,
+    search_latency_seconds: float = 0.3,
+    stall_ratio: float = 0.0,
+    stall_seconds: float = 5.0) -> InMemoryStore:
+    """
+    Swaps the Supabase client, the Groq model and the web search for the
+    fakes above. Returns the in-memory store.
+    """
+    if "main" in sys.modules:
+        raise RuntimeError("benchmarks.fakes.install() must run before main is imported")
+
+    store = InMemoryStore()
+    sync_client = FakeSupabase(store, asynchronous=False)
+    async_client = FakeSupabase(store, asynchronous=True)
+
+    async def get_async_supabase():
+        return async_client
+
+    client_module = types.ModuleType("src.db.supabase_client")
+    client_module.supabase = sync_client
+    client_module.get_async_supabase = get_async_supabase
+    sys.modules["src.db.supabase_client"] = client_module
+
+    import src.llm.model_registry as model_registry
+
+    def fake_chat_model(**kwargs: Any) -> FakeChatModel:
+        return FakeChatModel(
+            latency_seconds=llm_latency_seconds,
+            tokens_per_second=tokens_per_second,
+            reply_tokens=reply_tokens,
+            stall_ratio=stall_ratio,
+            stall_seconds=stall_seconds
+        )
+
+    model_registry.ChatGroq = fake_chat_model
+    model_registry.get_chat_model.cache_clear()
+    model_registry.get_fallback_model.cache_clear()
+
+    import src.agents.chat_agent.tools.web_search as web_search
+    web_search._run_search = make_fake_search(search_latency_seconds)
+
+    return store
@@ -0,0 +1,230 @@
+"""
+Offline load test of main.app.
+
+    python -m benchmarks.run --clients 20 --turns 5 --endpoint both
+
+Groq, DuckDuckGo and Supabase are replaced by the fakes in
+benchmarks/fakes.py (--storage sqlite uses the real SQLite storage
+backend instead of the in-memory Supabase stand-in). The app is served by an in-process uvicorn on a
+loopback port and driven by concurrent HTTP clients, each talking in
+its own thread. Reports throughput, p50/p99 latency and, for the
+streaming endpoint, time to first token.
+
+Tail latency under upstream stalls, with and without hedging:
+
+    python -m benchmarks.run --endpoint chat --stall-ratio 0.05 --stall-seconds 5
+    python -m benchmarks.run --endpoint chat --stall-ratio 0.05 --stall-seconds 5 --hedge
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import tempfile
+import time
+from dataclasses import dataclass, field
+
+from benchmarks import fakes
+
+
+# =========================
+# RESULTS
+# =========================
+
+@dataclass
+class EndpointResult:
+    endpoint: str
+    latencies: list[float] = field(default_factory=list)
+    ttfts: list[float] = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+
+    def summary(self) -> dict:
+        return {
+            "endpoint": self.endpoint,
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "throughput_rps": round(len(self.latencies) / self.elapsed, 2) if self.elapsed else 0.0,
+            "p50_ms": _ms(percentile(self.latencies, 50)),
+            "p99_ms": _ms(percentile(self.latencies, 99)),
+            "ttft_p50_ms": _ms(percentile(self.ttfts, 50)),
+            "ttft_p99_ms": _ms(percentile(self.ttfts, 99)),
+        }
+
+
+def percentile(values: list[float], p: float) -> float | None:
+    """
+    Nearest-rank percentile, None for no values.
+    """
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _ms(seconds: float | None) -> float | None:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+# =========================
+# CLIENTS
+# =========================
+
+def _message(client: int, turn: int, search_ratio: float) -> str:
+    # Deterministic mix: every n-th turn asks for a search
+    if search_ratio > 0 and (client + turn) % max(1, round(1 / search_ratio)) == 0:
+        return f"{fakes.SEARCH_PREFIX} news {client}-{turn}"
+
+    return f"message {turn} from client {client}"
+
+
+async def _chat_turn(http, thread_id: str, message: str, result: EndpointResult):
+    start = time.perf_counter()
+    response = await http.post(f"/chat/{thread_id}", params={"message": message})
+
+    if response.status_code != 200:
+        result.errors += 1
+        return
+
+    result.latencies.append(time.perf_counter() - start)
+
+
+async def _stream_turn(http, thread_id: str, message: str, result: EndpointResult):
+    start = time.perf_counter()
+    first = None
+
+    async with http.stream("POST", f"/chat/stream/{thread_id}", params={"message": message}) as response:
+        if response.status_code != 200:
+            result.errors += 1
+            return
+
+        async for chunk in response.aiter_raw():
+            if chunk and first is None:
+                first = time.perf_counter() - start
+
+    result.latencies.append(time.perf_counter() - start)
+    if first is not None:
+        result.ttfts.append(first)
+
+
+async def run_endpoint(http, endpoint: str, clients: int, turns: int, search_ratio: float) -> EndpointResult:
+    result = EndpointResult(endpoint)
+    turn = _chat_turn if endpoint == "chat" else _stream_turn
+
+    async def client(n: int):
+        for t in range(turns):
+            try:
+                await turn(http, f"bench-{endpoint}-{n}", _message(n, t, search_ratio), result)
+            except Exception:
+                result.errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    result.elapsed = time.perf_counter() - start
+
+    return result
+
+
+# =========================
+# SERVER
+# =========================
+
+async def serve_and_run(args) -> list[dict]:
+    import httpx
+    import uvicorn
+    from main import app
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="on"))
+    serving = asyncio.create_task(server.serve(sockets=[sock]))
+
+    while not server.started:
+        if serving.done():
+            serving.result()
+        await asyncio.sleep(0.01)
+
+    endpoints = ["chat", "stream"] if args.endpoint == "both" else [args.endpoint]
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120) as http:
+            return [
+                (await run_endpoint(http, endpoint, args.clients, args.turns, args.search_ratio)).summary()
+                for endpoint in endpoints
+            ]
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def print_table(rows: list[dict]):
+    columns = list(rows[0])
+    widths = [max(len(c), *(len(str(r[c])) for r in rows)) for c in columns]
+
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[c]).ljust(w) for c, w in zip(columns, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=10, help="concurrent clients")
+    parser.add_argument("--turns", type=int, default=5, help="messages per client")
+    parser.add_argument("--endpoint", choices=["chat", "stream", "both"], default="both")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="fake model time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--reply-tokens", type=int, default=40)
+    parser.add_argument("--search-latency", type=float, default=0.3, help="fake web search latency (s)")
+    parser.add_argument("--search-ratio", type=float, default=0.0, help="share of turns that trigger a search")
+    parser.add_argument("--checkpointer", choices=["sqlite", "memory"], default="sqlite")
+    parser.add_argument("--storage", choices=["memory", "sqlite"], default="memory",
+        help="in-memory Supabase stand-in or the SQLite storage backend")
+    parser.add_argument("--llm-tpm", type=int, default=0,
+        help="LLM token budget per minute (0 = unlimited, measures the app itself)")
+    parser.add_argument("--stall-ratio", type=float, default=0.0,
+        help="share of fake model calls that stall before the first token")
+    parser.add_argument("--stall-seconds", type=float, default=5.0, help="length of a stall (s)")
+    parser.add_argument("--hedge", action="store_true", help="enable hedged LLM requests")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="chat-bench-")
+    os.environ["CHECKPOINTER_BACKEND"] = args.checkpointer
+    os.environ["CHECKPOINT_DB_PATH"] = os.path.join(workdir, "checkpoints.sqlite")
+    os.environ["STORAGE_BACKEND"] = "sqlite" if args.storage == "sqlite" else "supabase"
+    os.environ["SQLITE_DB_PATH"] = os.path.join(workdir, "chat.sqlite")
+    os.environ.pop("WEB_SEARCH_CACHE_PATH", None)
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+    if args.llm_tpm:
+        os.environ["LLM_TOKENS_PER_MINUTE"] = str(args.llm_tpm)
+    else:
+        os.environ["LLM_SCHEDULER_ENABLED"] = "0"
+
+    os.environ["LLM_HEDGE_ENABLED"] = "1" if args.hedge else "0"
+
+    fakes.install(
+        llm_latency_seconds=args.llm_latency,
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens,
+        search_latency_seconds=args.search_latency,
+        stall_ratio=args.stall_ratio,
+        stall_seconds=args.stall_seconds
+    )
+
+    rows = asyncio.run(serve_and_run(args))
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
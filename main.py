@@ -1,9 +1,47 @@
-from fastapi import FastAPI
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn  
+from src.config import API_WORKERS
 from src.routes.chat_route import router
+from src.routes.metrics_route import router as metrics_router
+from src.db.write_behind import message_writer
+from src.memory.summary_queue import summary_queue
+from src.agents.chat_agent.graph import checkpointer
+from src.agents.chat_agent.checkpointer import BoundedSQLiteSaver, CHECKPOINT_COMPACT_INTERVAL_SECONDS
+from src.scheduling.thread_scheduler import ThreadBusyError
+from src.scheduling.llm_scheduler import LLMOverloadedError
+from src.streaming.resumable_stream import stream_sessions
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    message_writer.start()
+
+    compaction = None
+    if isinstance(checkpointer, BoundedSQLiteSaver):
+        compaction = asyncio.create_task(
+            checkpointer.run_compaction(CHECKPOINT_COMPACT_INTERVAL_SECONDS)
+        )
+
+    yield
+
+    if compaction is not None:
+        compaction.cancel()
+
+    # Unfinished streamed turns save their partial answers first
+    await stream_sessions.cancel_all()
+
+    # Persist everything the API already acknowledged before exiting
+    await message_writer.stop()
+    await summary_queue.stop(drain_timeout=10)
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 
 app.add_middleware(
@@ -12,10 +50,40 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination/sync cursors, stream ids and cache validators are headers
+    expose_headers=["ETag", "X-Next-Cursor", "X-Sync-Cursor", "X-Stream-Id", "Retry-After"],
 )
 
+@app.exception_handler(ThreadBusyError)
+async def thread_busy_handler(request: Request, exc: ThreadBusyError):
+    return JSONResponse(status_code=429, content={"detail": str(exc)})
+
+
+@app.exception_handler(LLMOverloadedError)
+async def llm_overloaded_handler(request: Request, exc: LLMOverloadedError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(round(exc.retry_after))}
+    )
+
+
 app.include_router(router)
+app.include_router(metrics_router)
+
+
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+
+# Worker processes share thread state through the SQLite checkpointer
+# (CHECKPOINT_DB_PATH) and the Supabase tables, so any worker can serve
+# any thread. Under gunicorn, set API_WORKERS to the -w value as well;
+# src/config.py lists what changes with more than one worker.
 
 
 if __name__ == "__main__":
-    uvicorn.run(app,host="127.0.0.1",port = 8000)
\ No newline at end of file
+    if API_WORKERS > 1:
+        # Workers are separate processes, so uvicorn needs an import string
+        uvicorn.run("main:app", host=API_HOST, port=API_PORT, workers=API_WORKERS)
+    else:
+        uvicorn.run(app,host=API_HOST,port = API_PORT)
@@ -20,7 +20,7 @@ def get_threads():
         url=f"{BASE_URL}/chat/threads"
     )
     r.raise_for_status()
-    return r.json()
+    return [t["thread_id"] for t in r.json()["threads"]]
 
 def get_history(thread_id):
     r = requests.get(
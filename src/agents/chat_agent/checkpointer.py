@@ -0,0 +1,557 @@
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.config import API_WORKERS
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process compaction lock
+    fcntl = None
+
+
+# =========================
+# CONFIG
+# =========================
+
+# "sqlite" (default) or "memory" (unbounded, lost on restart)
+CHECKPOINTER_BACKEND = os.getenv("CHECKPOINTER_BACKEND", "sqlite")
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "checkpoints.sqlite")
+
+# Retention
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "10"))
+CHECKPOINT_THREAD_TTL_SECONDS = float(os.getenv("CHECKPOINT_THREAD_TTL_SECONDS", str(7 * 24 * 3600)))
+CHECKPOINT_MAX_BYTES = int(os.getenv("CHECKPOINT_MAX_BYTES", str(512 * 1024 * 1024)))
+CHECKPOINT_COMPACT_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_COMPACT_INTERVAL_SECONDS", "300"))
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    checkpoint_type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+
+CREATE INDEX IF NOT EXISTS checkpoints_created_idx ON checkpoints (thread_id, created_at);
+
+CREATE TABLE IF NOT EXISTS checkpoint_writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    value_type TEXT NOT NULL,
+    value BLOB NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+class BoundedSQLiteSaver(BaseCheckpointSaver[str]):
+    """
+    LangGraph checkpointer on a local SQLite file (WAL) with retention.
+
+    - keep_last: only the newest K checkpoints per thread/namespace are
+      kept; older ones are pruned on every put
+    - thread_ttl_seconds: threads idle for longer are evicted by compact()
+    - max_bytes: compact() evicts least recently active threads until the
+      stored checkpoints, and then the file itself (page_count x
+      page_size, reclaimed with incremental vacuum), fit
+
+    Each checkpoint row holds its full channel values, so pruning one never
+    breaks another. Async methods run the SQLite calls in a worker thread.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        keep_last: int,
+        thread_ttl_seconds: float,
+        max_bytes: int,
+        serde=None
+    ):
+        super().__init__(serde=serde)
+        self.path = path
+        self.keep_last = keep_last
+        self.thread_ttl_seconds = thread_ttl_seconds
+        self.max_bytes = max_bytes
+
+        self.lock = threading.Lock()
+        # Several worker processes may open the file at the same time;
+        # the busy timeout makes them wait for each other's schema setup
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA busy_timeout=30000")
+
+        # Must be set before the first table exists (or be followed by a
+        # VACUUM), otherwise incremental_vacuum never shrinks the file
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._enable_incremental_vacuum()
+
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+
+        self.pruned_checkpoints = 0
+        self.evicted_threads = 0
+        self.last_compaction_seconds = 0.0
+        self.last_compaction_at = 0.0
+
+    # -------- helpers --------
+
+    def _enable_incremental_vacuum(self):
+        """
+        Files created before auto_vacuum was set keep auto_vacuum=NONE
+        until rebuilt; the one-time VACUUM converts them.
+        """
+        if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return
+
+        has_tables = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' LIMIT 1"
+        ).fetchone()
+
+        if has_tables:
+            self.conn.execute("VACUUM")
+
+    def _file_bytes(self) -> int:
+        """
+        Physical size of the database: page_count x page_size (caller holds lock).
+        """
+        page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        return page_count * page_size
+
+    def _release_free_pages(self):
+        # Each freed page is a result row; the pragma stops at the first
+        # unless all rows are fetched
+        self.conn.execute("PRAGMA incremental_vacuum").fetchall()
+        self.conn.commit()
+
+    def _tuple_from_row(self, thread_id: str, checkpoint_ns: str, row) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, c_type, c_blob, m_type, m_blob = row
+
+        writes = self.conn.execute(
+            """
+            SELECT task_id, channel, value_type, value FROM checkpoint_writes
+            WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?
+            ORDER BY task_id, idx
+            """,
+            (thread_id, checkpoint_ns, checkpoint_id)
+        ).fetchall()
+
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((c_type, c_blob)),
+            metadata=self.serde.loads_typed((m_type, m_blob)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((v_type, value)))
+                for task_id, channel, v_type, value in writes
+            ],
+        )
+
+    def _prune_thread(self, thread_id: str, checkpoint_ns: str):
+        """
+        Drops everything but the newest keep_last checkpoints (caller holds lock).
+        """
+        stale = self.conn.execute(
+            """
+            SELECT checkpoint_id FROM checkpoints
+            WHERE thread_id = ? AND checkpoint_ns = ?
+            ORDER BY checkpoint_id DESC
+            LIMIT -1 OFFSET ?
+            """,
+            (thread_id, checkpoint_ns, self.keep_last)
+        ).fetchall()
+
+        for (checkpoint_id,) in stale:
+            key = (thread_id, checkpoint_ns, checkpoint_id)
+            self.conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", key
+            )
+            self.conn.execute(
+                "DELETE FROM checkpoint_writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", key
+            )
+
+        self.pruned_checkpoints += len(stale)
+
+    def _delete_thread(self, thread_id: str):
+        self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+        self.conn.execute("DELETE FROM checkpoint_writes WHERE thread_id = ?", (thread_id,))
+
+    # -------- sync API --------
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_checkpoint_id, checkpoint_type, checkpoint, metadata_type, metadata"
+
+        with self.lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id)
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    f"""
+                    SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?
+                    ORDER BY checkpoint_id DESC LIMIT 1
+                    """,
+                    (thread_id, checkpoint_ns)
+                ).fetchone()
+
+            if row is None:
+                return None
+
+            return self._tuple_from_row(thread_id, checkpoint_ns, row)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        where, params = [], []
+
+        if config:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+
+        if before and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            params.append(before_id)
+
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "checkpoint_type, checkpoint, metadata_type, metadata FROM checkpoints"
+            + (f" WHERE {' AND '.join(where)}" if where else "")
+            + " ORDER BY checkpoint_id DESC"
+        )
+
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+
+            thread_id, checkpoint_ns = row[0], row[1]
+
+            with self.lock:
+                checkpoint_tuple = self._tuple_from_row(thread_id, checkpoint_ns, row[2:])
+
+            if filter and not all(
+                checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()
+            ):
+                continue
+
+            if limit is not None:
+                limit -= 1
+
+            yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+
+        c_type, c_blob = self.serde.dumps_typed(checkpoint)
+        m_type, m_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    c_type,
+                    c_blob,
+                    m_type,
+                    m_blob,
+                    len(c_blob) + len(m_blob),
+                    time.time(),
+                )
+            )
+            self._prune_thread(thread_id, checkpoint_ns)
+            self.conn.commit()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        # Special channels (errors, interrupts...) overwrite, the rest keep the first write
+        replace = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            v_type, v_blob = self.serde.dumps_typed(value)
+            rows.append((
+                thread_id,
+                checkpoint_ns,
+                checkpoint_id,
+                task_id,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                v_type,
+                v_blob,
+                task_path,
+            ))
+
+        with self.lock:
+            self.conn.executemany(
+                f"{verb} INTO checkpoint_writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self.conn.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.lock:
+            self._delete_thread(thread_id)
+            self.conn.commit()
+
+    def get_next_version(self, current: str | None, channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # -------- async API --------
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # -------- retention --------
+
+    def compact(self) -> dict:
+        """
+        Evicts idle threads and, if needed, the least recently active ones
+        until the store fits max_bytes; then returns freed pages to the OS.
+        """
+        started = time.perf_counter()
+        evicted = 0
+
+        with self.lock:
+            threads = self.conn.execute(
+                """
+                SELECT thread_id, MAX(created_at), SUM(size_bytes) FROM checkpoints
+                GROUP BY thread_id ORDER BY MAX(created_at)
+                """
+            ).fetchall()
+
+            cutoff = time.time() - self.thread_ttl_seconds
+            total_bytes = sum(size for _, _, size in threads)
+
+            for thread_id, last_activity, size in threads:
+                if last_activity >= cutoff and total_bytes <= self.max_bytes:
+                    break
+
+                self._delete_thread(thread_id)
+                total_bytes -= size
+                evicted += 1
+
+            self.conn.commit()
+            self._release_free_pages()
+
+            # Pages, indexes and the writes table take more room than the
+            # logical sizes: keep evicting until the file fits too
+            for thread_id, _, _ in threads[evicted:]:
+                if self._file_bytes() <= self.max_bytes:
+                    break
+
+                self._delete_thread(thread_id)
+                evicted += 1
+                self.conn.commit()
+                self._release_free_pages()
+
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+        self.evicted_threads += evicted
+        self.last_compaction_seconds = time.perf_counter() - started
+        self.last_compaction_at = time.time()
+
+        return {"evicted_threads": evicted, "duration_seconds": self.last_compaction_seconds}
+
+    def compact_if_leader(self) -> dict | None:
+        """
+        Runs compact() unless another worker process is already compacting
+        the same file. Returns None when skipped.
+        """
+        if fcntl is None:
+            return self.compact()
+
+        with open(f"{self.path}.compact.lock", "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+
+            try:
+                return self.compact()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    async def run_compaction(self, interval_seconds: float):
+        """
+        Background job: compact every interval_seconds until cancelled.
+        """
+        while True:
+            await asyncio.sleep(interval_seconds)
+            await asyncio.to_thread(self.compact_if_leader)
+
+    def stats(self) -> dict:
+        with self.lock:
+            threads, checkpoints, stored_bytes = self.conn.execute(
+                "SELECT COUNT(DISTINCT thread_id), COUNT(*), COALESCE(SUM(size_bytes), 0) FROM checkpoints"
+            ).fetchone()
+            writes = self.conn.execute("SELECT COUNT(*) FROM checkpoint_writes").fetchone()[0]
+            file_bytes = self._file_bytes()
+
+        return {
+            "threads": threads,
+            "checkpoints": checkpoints,
+            "pending_writes": writes,
+            "stored_bytes": stored_bytes,
+            "file_bytes": file_bytes,
+            "pruned_checkpoints": self.pruned_checkpoints,
+            "evicted_threads": self.evicted_threads,
+            "last_compaction_seconds": self.last_compaction_seconds,
+            "last_compaction_at": self.last_compaction_at,
+        }
+
+
+def create_checkpointer() -> BaseCheckpointSaver:
+    """
+    Builds the checkpointer selected by CHECKPOINTER_BACKEND.
+    """
+    if CHECKPOINTER_BACKEND == "memory":
+        if API_WORKERS > 1:
+            raise RuntimeError(
+                "CHECKPOINTER_BACKEND=memory cannot be shared by several workers; "
+                "use the sqlite backend when API_WORKERS > 1"
+            )
+        return MemorySaver()
+
+    return BoundedSQLiteSaver(
+        path=CHECKPOINT_DB_PATH,
+        keep_last=CHECKPOINT_KEEP_LAST,
+        thread_ttl_seconds=CHECKPOINT_THREAD_TTL_SECONDS,
+        max_bytes=CHECKPOINT_MAX_BYTES
+    )
@@ -1,13 +1,14 @@
 from langgraph.graph import START,END, StateGraph
 from langgraph.graph.state import CompiledStateGraph
 from src.agents.chat_agent.states.chat_agent_state import ChatAgentState
-from src.agents.chat_agent.nodes.chat_node import chat
+from src.agents.chat_agent.nodes.chat_node import chat, achat
 from src.agents.chat_agent.nodes.should_continue import should_continue
-from src.agents.chat_agent.nodes.tool_executer_node import tool_extractor
-from langgraph.checkpoint.memory import MemorySaver
+from src.agents.chat_agent.nodes.tool_executer_node import tool_extractor, atool_extractor
+from src.agents.chat_agent.checkpointer import create_checkpointer
+from langchain_core.runnables import RunnableLambda
 
 
-checkpointer = MemorySaver()
+checkpointer = create_checkpointer()
 
 
 def create_chat_agent_graph()-> CompiledStateGraph:
@@ -15,8 +16,10 @@ def create_chat_agent_graph()-> CompiledStateGraph:
     """
     graph_builder = StateGraph(ChatAgentState)
 
-    graph_builder.add_node('chat_node', chat)
-    graph_builder.add_node('tool_executer_node', tool_extractor)
+    # Each node has a sync and an async implementation so the graph works
+    # with both invoke/stream and ainvoke/astream.
+    graph_builder.add_node('chat_node', RunnableLambda(chat, afunc=achat))
+    graph_builder.add_node('tool_executer_node', RunnableLambda(tool_extractor, afunc=atool_extractor))
     
 
     graph_builder.add_edge(START, 'chat_node')
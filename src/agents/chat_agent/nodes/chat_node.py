@@ -1,24 +1,20 @@
-from langchain_groq import ChatGroq
+from functools import lru_cache
+
 from src.agents.chat_agent.states.chat_agent_state import ChatAgentState
 from src.agents.chat_agent.tools.date_time import get_current_date_and_time
 from src.agents.chat_agent.tools.web_search import search_the_web
-from dotenv import load_dotenv
-import os
+from src.llm.resilient_model import get_resilient_chat_model
+from src.memory.context_builder import context_builder
+from src.metrics.prometheus import stage, record_llm_usage
+from src.scheduling.llm_scheduler import llm_scheduler
 from langchain.messages import SystemMessage
 
 
 
-load_dotenv()
-
-GROQ_API_KEY = os.getenv('GROQ_API_KEY')
-
-def chat(state: ChatAgentState) -> ChatAgentState:
-    """
-    """
-    SYSTEM_MESSAGE = SystemMessage(
-        content=(
-            """
-                You are a smart, friendly, and conversational AI assistant.
+SYSTEM_MESSAGE = SystemMessage(
+    content=(
+        """
+            You are a smart, friendly, and conversational AI assistant.
 
 Your personality:
 - Helpful, calm, and confident
@@ -50,25 +46,68 @@ Your goal:
 - Be pleasant to talk to
 - Make the interaction feel smooth, human, and helpful
 
-            """
-            )
-    )
+        """
+        )
+)
 
-    model = ChatGroq(
-        model='openai/gpt-oss-120b',
-        api_key=GROQ_API_KEY
-    )
 
-    model = model.bind_tools([
+@lru_cache(maxsize=1)
+def get_bound_model():
+    """
+    Builds the tool-bound chat model (with hedging / fallback) once per
+    process.
+    """
+    return get_resilient_chat_model().bind_tools([
         get_current_date_and_time,
         search_the_web
     ])
-    messages = state["messages"]
 
-    # Ensure system message is always first
-    if not messages or messages[0].type != "system":
-        messages = [SYSTEM_MESSAGE] + messages
 
-    answer = model.invoke(messages)
+def _prepare(state: ChatAgentState):
+    """
+    Returns the tool-bound model and the message list for one chat step.
+    """
+    # System prompt always first; the summary, if any, stays pinned after it
+    messages = [SYSTEM_MESSAGE] + state["messages"]
+
+    # Fit into the token budget instead of a fixed message count
+    return get_bound_model(), context_builder.build(messages)
+
+
+def _input_tokens(messages) -> int:
+    # Token counts are cached by context_builder, so this is cheap
+    return sum(context_builder.count(m) for m in messages)
+
+
+def chat(state: ChatAgentState) -> ChatAgentState:
+    """
+    Sync chat node: one LLM step over the current state.
+    """
+    with stage("chat_node"):
+        model, messages = _prepare(state)
+
+        # Waits for token budget instead of running into Groq's 429s
+        with llm_scheduler.call_blocking(_input_tokens(messages)) as call:
+            answer = model.invoke(messages)
+            call.settle(answer)
+
+    record_llm_usage("chat", answer)
+
+    return {'messages': [answer]}
+
+
+async def achat(state: ChatAgentState) -> ChatAgentState:
+    """
+    Async chat node used by graph.ainvoke / graph.astream.
+    """
+    with stage("chat_node"):
+        model, messages = _prepare(state)
+
+        # Priority comes from the handler (streamed chat goes first)
+        async with llm_scheduler.call(_input_tokens(messages)) as call:
+            answer = await model.ainvoke(messages)
+            call.settle(answer)
+
+    record_llm_usage("chat", answer)
 
     return {'messages': [answer]}
\ No newline at end of file
@@ -17,7 +17,8 @@ def should_continue(state: ChatAgentState) -> Literal['tool_executer_node', END]
     last_message = messages[-1]
 
     #if the LLM  makes a tool call, then perform an action
-    if last_message.tool_calls:
+    #(after a state update the last message may not be an AI message)
+    if getattr(last_message, "tool_calls", None):
         return 'tool_executer_node'
     
     #Otherwise, we stop (reply to the user)
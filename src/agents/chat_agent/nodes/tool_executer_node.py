@@ -1,8 +1,31 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
 from src.agents.chat_agent.states.chat_agent_state import ChatAgentState
+from src.agents.chat_agent.tools.cancellation import cancellation_scope, raise_if_cancelled
 from src.agents.chat_agent.tools.date_time import get_current_date_and_time
 from src.agents.chat_agent.tools.web_search import search_the_web
+from src.metrics.prometheus import stage, record_tool
 from langchain.messages import ToolMessage
 
+
+# =========================
+# CONFIG
+# =========================
+
+DEFAULT_TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "15"))
+
+TOOL_TIMEOUTS = {
+    "search_the_web": float(os.getenv("WEB_SEARCH_TIMEOUT_SECONDS", "10")),
+}
+
+MAX_TOOL_WORKERS = int(os.getenv("MAX_TOOL_WORKERS", "8"))
+
+
 tools = [
     get_current_date_and_time,
     search_the_web
@@ -10,27 +33,156 @@ tools = [
 
 tools_by_name  = {tool.name : tool for tool in tools}
 
+# Bounded pool for sync tools, on both paths (the async path gathers
+# the calls and cancels their futures when the turn is cancelled)
+_executor = ThreadPoolExecutor(max_workers=MAX_TOOL_WORKERS, thread_name_prefix="tool")
+
+
+# =========================
+# HELPERS
+# =========================
+
+def _timeout_for(tool_name: str) -> float:
+    return TOOL_TIMEOUTS.get(tool_name, DEFAULT_TOOL_TIMEOUT_SECONDS)
+
+
+def _error_message(tool_call: dict, error: str, detail: str) -> ToolMessage:
+    """
+    Structured error result, so the LLM can recover instead of the run crashing.
+    """
+    return ToolMessage(
+        content=json.dumps({"error": error, "detail": detail}),
+        name=tool_call['name'],
+        tool_call_id = tool_call['id'],
+        status="error"
+    )
+
+
+def _timed_invoke(tool, args, cancelled: threading.Event | None = None) -> tuple:
+    """
+    Runs one tool call on the pool; returns (observation, seconds).
+    The tool can check `cancelled` via raise_if_cancelled().
+    """
+    start = time.monotonic()
+
+    with cancellation_scope(cancelled):
+        raise_if_cancelled()
+        observation = tool.invoke(args)
+
+    return observation, time.monotonic() - start
+
+
+async def _ainvoke(tool, args, timeout: float):
+    """
+    Awaits one tool call, cancellably. Native async tools are awaited
+    directly. Sync tools run on the bounded pool: on cancel or timeout a
+    call still queued never starts, and a running one sees its
+    cancellation flag at its next raise_if_cancelled() checkpoint.
+    """
+    if getattr(tool, "coroutine", None) is not None:
+        return await asyncio.wait_for(tool.ainvoke(args), timeout=timeout)
+
+    cancelled = threading.Event()
+    future = _executor.submit(_timed_invoke, tool, args, cancelled)
+
+    try:
+        observation, _ = await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+    finally:
+        if not future.done():
+            cancelled.set()
+            future.cancel()
+
+    return observation
+
+
+def _result_message(tool_call: dict, observation) -> ToolMessage:
+    return ToolMessage(
+        content=observation,
+        name=tool_call['name'],
+        tool_call_id = tool_call['id']
+    )
+
+
+# =========================
+# NODES
+# =========================
+
 def tool_extractor(state : ChatAgentState) -> ChatAgentState:
     """
-    Docstring for tool_extractor
-    
-    :param state: Description
-    :type state: ChatAgentState
-    :return: Description
-    :rtype: ChatAgentState
+    Runs every tool call of the last assistant message concurrently.
+
+    ToolMessages keep the order of the original tool calls. A tool that
+    fails, times out or does not exist yields an error ToolMessage.
     """
 
-    result = []
+    with stage("tool_executer_node"):
+        tool_calls = state['messages'][-1].tool_calls
+        pending = []
+
+        for tool_call in tool_calls:
+            tool = tools_by_name.get(tool_call['name'])
+
+            if tool is None:
+                pending.append((tool_call, None, None, None))
+                continue
+
+            submitted = time.monotonic()
+            deadline = submitted + _timeout_for(tool_call['name'])
+            pending.append((tool_call, _executor.submit(_timed_invoke, tool, tool_call['args']), submitted, deadline))
 
-    for tool_call in state['messages'][-1].tool_calls:
-        tool = tools_by_name[tool_call['name']]
-        observation = tool.invoke(tool_call['args'])
+        result = []
+
+        for tool_call, future, submitted, deadline in pending:
+            if future is None:
+                record_tool(tool_call['name'], 0.0, "unknown_tool")
+                result.append(_error_message(tool_call, "unknown_tool", tool_call['name']))
+                continue
+
+            try:
+                observation, seconds = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                record_tool(tool_call['name'], seconds, "ok")
+                result.append(_result_message(tool_call, observation))
+            except FutureTimeoutError:
+                future.cancel()
+                record_tool(tool_call['name'], time.monotonic() - submitted, "timeout")
+                result.append(_error_message(tool_call, "timeout", f"{tool_call['name']} took longer than {_timeout_for(tool_call['name'])}s"))
+            except Exception as e:
+                record_tool(tool_call['name'], time.monotonic() - submitted, "error")
+                result.append(_error_message(tool_call, type(e).__name__, str(e)))
+
+    return {'messages':result}
+
+
+async def _arun_tool(tool_call: dict) -> ToolMessage:
+    tool = tools_by_name.get(tool_call['name'])
+
+    if tool is None:
+        record_tool(tool_call['name'], 0.0, "unknown_tool")
+        return _error_message(tool_call, "unknown_tool", tool_call['name'])
+
+    timeout = _timeout_for(tool_call['name'])
+    started = time.monotonic()
+
+    try:
+        observation = await _ainvoke(tool, tool_call['args'], timeout)
+        record_tool(tool_call['name'], time.monotonic() - started, "ok")
+        return _result_message(tool_call, observation)
+    except asyncio.TimeoutError:
+        record_tool(tool_call['name'], time.monotonic() - started, "timeout")
+        return _error_message(tool_call, "timeout", f"{tool_call['name']} took longer than {timeout}s")
+    except Exception as e:
+        record_tool(tool_call['name'], time.monotonic() - started, "error")
+        return _error_message(tool_call, type(e).__name__, str(e))
+
+
+async def atool_extractor(state : ChatAgentState) -> ChatAgentState:
+    """
+    Async variant of tool_extractor, runs the calls with asyncio.gather.
+    """
 
-        result.append(
-            ToolMessage(
-                content=observation,
-                tool_call_id = tool_call['id']
-            )
+    with stage("tool_executer_node"):
+        result = await asyncio.gather(
+            *(_arun_tool(tool_call) for tool_call in state['messages'][-1].tool_calls)
         )
 
-    return {'messages':result}
\ No newline at end of file
+    return {'messages':list(result)}
@@ -1,9 +1,114 @@
+import os
+import uuid
 from typing import TypedDict, Annotated
-from langchain.messages import AnyMessage
-import operator
+
+from langchain.messages import AnyMessage, RemoveMessage, SystemMessage
+
+from src.memory.context_loader import ROW_MESSAGE_ID_PREFIX
+
+
+# =========================
+# CONFIG
+# =========================
+
+# Messages kept in the checkpointed state per thread (system memory is
+# kept on top of this); older ones still live in Supabase
+STATE_MAX_MESSAGES = int(os.getenv("STATE_MAX_MESSAGES", "60"))
+
+
+def _find(messages: list[AnyMessage], message: AnyMessage, after: int | None = None) -> int | None:
+    """
+    Position of message in messages by id. A stored row (id "row:...")
+    also matches the graph's own copy of an answer, saved without that
+    id: the next AI message after position `after`, past tool round trips.
+    """
+    for i, m in enumerate(messages):
+        if m.id == message.id:
+            return i
+
+    if after is None or not message.id.startswith(ROW_MESSAGE_ID_PREFIX):
+        return None
+
+    for i in range(after, len(messages)):
+        m = messages[i]
+
+        if m.type not in ("ai", "tool"):
+            break
+
+        if (
+            m.type == message.type
+            and m.content == message.content
+            and not (m.id or "").startswith(ROW_MESSAGE_ID_PREFIX)
+            and not getattr(m, "tool_calls", None)
+        ):
+            return i
+
+    return None
+
+
+def merge_messages(left: list[AnyMessage], right: list[AnyMessage]) -> list[AnyMessage]:
+    """
+    Reducer for ChatAgentState.messages.
+
+    - A message already in the state is replaced instead of appended
+      again, so re-sending history does not grow the state.
+    - Unknown messages keep their position relative to the known ones
+      (re-sent older history lands before them, new messages after).
+    - RemoveMessage(id=...) deletes the message with that id.
+    - Only the newest STATE_MAX_MESSAGES messages are kept, plus system
+      memory; the window never starts with an orphan tool result.
+    """
+    removed = {m.id for m in right if isinstance(m, RemoveMessage)}
+    merged = [m for m in left if m.id not in removed]
+    right = [
+        m if m.id else m.model_copy(update={"id": str(uuid.uuid4())})
+        for m in right
+        if not isinstance(m, RemoveMessage)
+    ]
+
+    # Unknown messages before the first known one go in front of it
+    # (re-sent history older than the window)
+    cursor = next(
+        (
+            p for p in (_find(merged, m) for m in right if not isinstance(m, SystemMessage))
+            if p is not None
+        ),
+        len(merged)
+    )
+
+    for message in right:
+        position = _find(merged, message, cursor)
+
+        if isinstance(message, SystemMessage):
+            if position is None:
+                merged.append(message)
+            else:
+                merged[position] = message
+            continue
+
+        if position is None:
+            merged.insert(cursor, message)
+            cursor += 1
+            continue
+
+        if merged[position].id != message.id:
+            # Keep the graph's message (and its metadata), under the row id
+            message = merged[position].model_copy(update={"id": message.id})
+
+        merged[position] = message
+        cursor = position + 1
+
+    memory = [m for m in merged if isinstance(m, SystemMessage)]
+    window = [m for m in merged if not isinstance(m, SystemMessage)][-STATE_MAX_MESSAGES:]
+
+    while window and window[0].type == "tool":
+        window.pop(0)
+
+    return memory + window
+
 
 class ChatAgentState(TypedDict):
     """
-    This is a class
+    Graph state: the conversation window of one thread.
     """
-    messages  : Annotated[list[AnyMessage], operator.add]
\ No newline at end of file
+    messages  : Annotated[list[AnyMessage], merge_messages]
@@ -0,0 +1,37 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+_cancelled: ContextVar[threading.Event | None] = ContextVar("tool_cancelled", default=None)
+
+
+class ToolCancelledError(RuntimeError):
+    """
+    Raised inside a sync tool whose turn was cancelled.
+    """
+
+
+@contextmanager
+def cancellation_scope(event: threading.Event | None):
+    """
+    Makes event the cancellation flag of the tool call run in the block
+    (on the executor thread that runs it).
+    """
+    token = _cancelled.set(event)
+
+    try:
+        yield
+    finally:
+        _cancelled.reset(token)
+
+
+def raise_if_cancelled():
+    """
+    Checkpoint for sync tools: stops before slow work (e.g. a network
+    request) once the tool call has been cancelled.
+    """
+    event = _cancelled.get()
+
+    if event is not None and event.is_set():
+        raise ToolCancelledError("tool call cancelled")
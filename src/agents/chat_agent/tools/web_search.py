@@ -1,19 +1,67 @@
+import os
+import re
+
 from langchain_community.tools import DuckDuckGoSearchRun
 from langchain.tools import tool
 
+from src.agents.chat_agent.tools.cancellation import raise_if_cancelled
+from src.cache.ttl_cache import TTLCache, SQLiteCacheBackend
+
+
+# =========================
+# CONFIG
+# =========================
+
+WEB_SEARCH_MAX_RESULTS = 3
+WEB_SEARCH_CACHE_TTL_SECONDS = float(os.getenv("WEB_SEARCH_CACHE_TTL_SECONDS", "600"))
+WEB_SEARCH_CACHE_MAXSIZE = int(os.getenv("WEB_SEARCH_CACHE_MAXSIZE", "1024"))
+WEB_SEARCH_NEGATIVE_TTL_SECONDS = float(os.getenv("WEB_SEARCH_NEGATIVE_TTL_SECONDS", "30"))
+
+# Optional SQLite file shared by all workers; in-process only when unset
+WEB_SEARCH_CACHE_PATH = os.getenv("WEB_SEARCH_CACHE_PATH")
+
+
 search = DuckDuckGoSearchRun()
 
-@tool
-def search_the_web(query: str) -> str:
+search_cache = TTLCache(
+    maxsize=WEB_SEARCH_CACHE_MAXSIZE,
+    ttl_seconds=WEB_SEARCH_CACHE_TTL_SECONDS,
+    negative_ttl_seconds=WEB_SEARCH_NEGATIVE_TTL_SECONDS,
+    backend=(
+        SQLiteCacheBackend(WEB_SEARCH_CACHE_PATH, namespace="web_search")
+        if WEB_SEARCH_CACHE_PATH else None
+    )
+)
+
+
+def normalize_query(query: str) -> str:
     """
-    Search the web for current and up-to-date information based on a query.
+    Cache key for a query: case, surrounding punctuation and spacing ignored.
     """
-    results = search(query, max_results=3)
+    return re.sub(r"\s+", " ", query).strip().strip("?!.").strip().lower()
+
+
+def _run_search(query: str) -> str:
+    results = search.api_wrapper.results(query, max_results=WEB_SEARCH_MAX_RESULTS)
 
     summaries = []
     for r in results:
         summaries.append(
-            f"{r['title']}: {r['body'][:250]}"
+            f"{r['title']}: {r['snippet'][:250]}"
         )
 
     return "\n".join(summaries)
+
+
+@tool
+def search_the_web(query: str) -> str:
+    """
+    Search the web for current and up-to-date information based on a query.
+    """
+    # Outside get_or_compute, so a cancelled call is not negatively cached
+    raise_if_cancelled()
+
+    return search_cache.get_or_compute(
+        normalize_query(query),
+        lambda: _run_search(query)
+    )
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import re
+
+from langchain.messages import AnyMessage
+
+from src.cache.ttl_cache import TTLCache, SQLiteCacheBackend
+from src.memory.context_loader import ThreadContext
+from src.metrics import prometheus
+
+
+# =========================
+# CONFIG
+# =========================
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "0") == "1"
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_MAXSIZE = int(os.getenv("RESPONSE_CACHE_MAXSIZE", "2048"))
+
+# Optional SQLite file shared by all workers; in-process only when unset
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH")
+
+# Longer messages are rarely repeated verbatim; not worth a cache entry
+RESPONSE_CACHE_MAX_MESSAGE_CHARS = 500
+
+
+RESPONSE_CACHE_LOOKUPS = prometheus.counter(
+    "chat_response_cache_lookups_total",
+    "Answer cache lookups by result (hit, miss, skip)",
+    ("result",)
+)
+
+RESPONSE_CACHE_STORES = prometheus.counter(
+    "chat_response_cache_stores_total",
+    "Answers offered to the cache by outcome (stored, bypass_tools, bypass_empty)",
+    ("outcome",)
+)
+
+
+def normalize_prompt(message: str) -> str:
+    """
+    Case, surrounding punctuation and spacing do not change the answer.
+    """
+    return re.sub(r"\s+", " ", message).strip().strip("?!.").strip().lower()
+
+
+def context_fingerprint(context: ThreadContext) -> str:
+    """
+    Hash of everything besides the new message that shapes the answer:
+    the injected summary and the recent messages.
+    """
+    payload = json.dumps(
+        [context.summary, [(row["sender"], row["content"]) for row in context.messages]],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def used_tools(turn: list[AnyMessage]) -> bool:
+    return any(
+        m.type == "tool" or getattr(m, "tool_calls", None)
+        for m in turn
+    )
+
+
+class ResponseCache:
+    """
+    Answer cache in front of the graph, keyed on the normalized user
+    message plus the context fingerprint, so "hi" in a fresh thread is
+    answered once per TTL instead of once per thread.
+
+    Answers that called a tool are never stored: they depend on the time
+    or on the web.
+    """
+
+    def __init__(self, cache: TTLCache, enabled: bool = True):
+        self.cache = cache
+        self.enabled = enabled
+
+    def key(self, message: str, context: ThreadContext) -> str | None:
+        """
+        Cache key for a turn, or None when the turn is not cacheable.
+        """
+        if not self.enabled or len(message) > RESPONSE_CACHE_MAX_MESSAGE_CHARS:
+            return None
+
+        prompt = normalize_prompt(message)
+
+        if not prompt:
+            return None
+
+        return f"{context_fingerprint(context)}:{prompt}"
+
+    def get(self, key: str | None) -> str | None:
+        if key is None:
+            RESPONSE_CACHE_LOOKUPS.inc(result="skip")
+            return None
+
+        answer = self.cache.get(key)
+        RESPONSE_CACHE_LOOKUPS.inc(result="hit" if answer is not None else "miss")
+
+        return answer
+
+    def store(self, key: str | None, answer: str, turn: list[AnyMessage]):
+        """
+        Caches the answer of a finished turn unless it used tools.
+        """
+        if key is None:
+            return
+
+        if used_tools(turn):
+            RESPONSE_CACHE_STORES.inc(outcome="bypass_tools")
+            return
+
+        if not answer.strip():
+            RESPONSE_CACHE_STORES.inc(outcome="bypass_empty")
+            return
+
+        self.cache.set(key, answer)
+        RESPONSE_CACHE_STORES.inc(outcome="stored")
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, **self.cache.stats()}
+
+
+response_cache = ResponseCache(
+    TTLCache(
+        maxsize=RESPONSE_CACHE_MAXSIZE,
+        ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+        backend=(
+            SQLiteCacheBackend(RESPONSE_CACHE_PATH, namespace="responses")
+            if RESPONSE_CACHE_PATH else None
+        )
+    ),
+    enabled=RESPONSE_CACHE_ENABLED
+)
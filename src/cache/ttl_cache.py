@@ -0,0 +1,228 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Protocol
+
+
+# Entry layout shared by the in-process store and the backends:
+# (expires_at, is_error, value)
+Entry = tuple[float, bool, Any]
+
+_MISSING = object()
+
+
+class CachedError(RuntimeError):
+    """
+    Raised when a negatively cached failure is served from the cache.
+    """
+
+
+class CacheBackend(Protocol):
+    """
+    Shared second-level store, e.g. a file several workers can read.
+    """
+
+    def get(self, key: str) -> Entry | None: ...
+
+    def set(self, key: str, entry: Entry) -> None: ...
+
+
+class SQLiteCacheBackend:
+    """
+    Cache backend on a local SQLite file, shared by every process on the box.
+    Values must be JSON serializable.
+    """
+
+    def __init__(self, path: str, namespace: str = "default"):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                is_error INTEGER NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Entry | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at, is_error, value FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return row[0], bool(row[1]), json.loads(row[2])
+
+    def set(self, key: str, entry: Entry) -> None:
+        expires_at, is_error, value = entry
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, expires_at, int(is_error), json.dumps(value))
+            )
+            # Expired rows are dropped lazily on write
+            self._conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND expires_at < ?",
+                (self.namespace, time.time())
+            )
+            self._conn.commit()
+
+
+class TTLCache:
+    """
+    Size-bounded LRU cache with per-entry TTL, negative caching and
+    hit/miss counters. An optional backend is consulted on local misses
+    and written through on every set.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl_seconds: float,
+        negative_ttl_seconds: float = 0,
+        backend: CacheBackend | None = None
+    ):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.backend = backend
+
+        self._data: OrderedDict[str, Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+
+    # -------- internal --------
+
+    def _store_local(self, key: str, entry: Entry):
+        self._data[key] = entry
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def _lookup(self, key: str) -> Entry | None:
+        now = time.time()
+
+        with self._lock:
+            entry = self._data.get(key)
+
+            if entry is not None:
+                if entry[0] > now:
+                    self._data.move_to_end(key)
+                    return entry
+                del self._data[key]
+
+        if self.backend is None:
+            return None
+
+        entry = self.backend.get(key)
+
+        if entry is None or entry[0] <= now:
+            return None
+
+        with self._lock:
+            self._store_local(key, entry)
+
+        return entry
+
+    # -------- public --------
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Returns the cached value, or default on a miss.
+        Raises CachedError if the key holds a cached failure.
+        """
+        entry = self._lookup(key)
+
+        if entry is None:
+            self.misses += 1
+            return default
+
+        _, is_error, value = entry
+
+        if is_error:
+            self.negative_hits += 1
+            raise CachedError(value)
+
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: float | None = None):
+        entry = (time.time() + (ttl_seconds or self.ttl_seconds), False, value)
+
+        with self._lock:
+            self._store_local(key, entry)
+
+        if self.backend is not None:
+            self.backend.set(key, entry)
+
+    def set_error(self, key: str, error: str):
+        """
+        Negative caching: remember a failure for negative_ttl_seconds.
+        No-op when negative caching is disabled.
+        """
+        if self.negative_ttl_seconds <= 0:
+            return
+
+        entry = (time.time() + self.negative_ttl_seconds, True, error)
+
+        with self._lock:
+            self._store_local(key, entry)
+
+        if self.backend is not None:
+            self.backend.set(key, entry)
+
+    def get_or_compute(self, key: str, compute):
+        """
+        Returns the cached value or calls compute(), caching the result.
+        Failures are negatively cached (if enabled) and re-raised.
+        """
+        value = self.get(key, _MISSING)
+
+        if value is not _MISSING:
+            return value
+
+        try:
+            value = compute()
+        except Exception as e:
+            self.set_error(key, f"{type(e).__name__}: {e}")
+            raise
+
+        self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.negative_hits
+
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,23 @@
+import os
+
+
+# =========================
+# CONFIG
+# =========================
+
+# Number of API worker processes (uvicorn workers, or gunicorn -w).
+#
+# Workers share the database and the SQLite checkpointer, but anything
+# kept in memory (caches, counters, stream sessions, token buckets) is
+# per worker, and a thread's requests can land on any of them. Such
+# components either split their limit across workers or, when their
+# state would go stale, default to off with more than one worker.
+API_WORKERS = max(1, int(os.getenv("API_WORKERS", "1")))
+
+
+def single_worker_flag(name: str) -> bool:
+    """
+    Boolean env flag that defaults to on with a single worker and to off
+    with API_WORKERS > 1; setting it explicitly overrides the default.
+    """
+    return os.getenv(name, "1" if API_WORKERS == 1 else "0") == "1"
@@ -0,0 +1,56 @@
+import base64
+import json
+from datetime import datetime
+
+
+def encode_cursor(*values) -> str:
+    """
+    Opaque, URL-safe cursor for keyset pagination.
+    """
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode()
+
+
+class InvalidCursorError(ValueError):
+    """
+    Raised when a client-supplied cursor is not one we issued.
+    """
+
+
+def decode_cursor(cursor: str, key_type: type = str) -> list:
+    """
+    Decodes a cursor from encode_cursor back into its keyset values: a
+    timestamp and a key of key_type (the row id or thread id). Raises
+    InvalidCursorError for anything else.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursorError("invalid cursor") from e
+
+    if not isinstance(values, list) or len(values) != 2:
+        raise InvalidCursorError("invalid cursor")
+
+    timestamp, key = values
+
+    if not isinstance(timestamp, str) or type(key) is not key_type:
+        raise InvalidCursorError("invalid cursor")
+
+    try:
+        datetime.fromisoformat(timestamp)
+    except ValueError as e:
+        raise InvalidCursorError("invalid cursor") from e
+
+    return values
+
+
+def keyset_filter(first: str, second: str, values: list, op: str) -> str:
+    """
+    PostgREST or_() filter for rows strictly before/after (first, second)
+    in a two-column keyset. op is "lt" or "gt".
+    """
+    first_value, second_value = values
+
+    return (
+        f'{first}.{op}."{first_value}",'
+        f'and({first}.eq."{first_value}",{second}.{op}."{second_value}")'
+    )
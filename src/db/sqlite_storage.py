@@ -0,0 +1,279 @@
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    thread_id   TEXT NOT NULL,
+    sender      TEXT NOT NULL,
+    content     TEXT NOT NULL,
+    approved    INTEGER,
+    created_at  TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS chat_messages_thread_created_idx
+    ON chat_messages (thread_id, created_at, id);
+
+CREATE TABLE IF NOT EXISTS chat_summaries (
+    thread_id        TEXT PRIMARY KEY,
+    summary          TEXT NOT NULL,
+    last_message_id  INTEGER,
+    last_message_at  TEXT
+);
+
+CREATE TABLE IF NOT EXISTS chat_threads (
+    thread_id         TEXT PRIMARY KEY,
+    title             TEXT,
+    message_count     INTEGER NOT NULL DEFAULT 0,
+    last_activity_at  TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS chat_threads_recency_idx
+    ON chat_threads (last_activity_at DESC, thread_id DESC);
+
+-- Same thread index the Postgres trigger maintains
+CREATE TRIGGER IF NOT EXISTS chat_messages_thread_index
+AFTER INSERT ON chat_messages
+BEGIN
+    INSERT INTO chat_threads (thread_id, title, message_count, last_activity_at)
+    VALUES (
+        NEW.thread_id,
+        CASE WHEN NEW.sender = 'user' THEN substr(NEW.content, 1, 80) END,
+        1,
+        NEW.created_at
+    )
+    ON CONFLICT (thread_id) DO UPDATE SET
+        message_count = message_count + 1,
+        last_activity_at = max(last_activity_at, excluded.last_activity_at),
+        title = coalesce(title, excluded.title);
+END;
+"""
+
+# Constant statements, so sqlite3's per-connection statement cache
+# prepares each one only once
+INSERT_MESSAGE = """
+    INSERT INTO chat_messages (thread_id, sender, content, approved, created_at)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+SELECT_MESSAGE = "SELECT id, thread_id, sender, content, approved, created_at FROM chat_messages WHERE id = ?"
+
+SELECT_SUMMARY = "SELECT summary, last_message_id, last_message_at FROM chat_summaries WHERE thread_id = ?"
+
+SELECT_MESSAGE_COUNT = "SELECT message_count FROM chat_threads WHERE thread_id = ?"
+
+SELECT_RECENT_VISIBLE = """
+    SELECT id, sender, content, created_at FROM chat_messages
+    WHERE thread_id = ? AND approved IS NOT 0
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+"""
+
+SELECT_SINCE = """
+    SELECT id, sender, content, created_at FROM chat_messages
+    WHERE thread_id = ? AND id > ?
+    ORDER BY id
+    LIMIT ?
+"""
+
+UPSERT_SUMMARY = """
+    INSERT INTO chat_summaries (thread_id, summary, last_message_id, last_message_at)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (thread_id) DO UPDATE SET
+        summary = excluded.summary,
+        last_message_id = coalesce(excluded.last_message_id, last_message_id),
+        last_message_at = coalesce(excluded.last_message_at, last_message_at)
+"""
+
+UPDATE_FEEDBACK = "UPDATE chat_messages SET approved = ? WHERE id = ? RETURNING thread_id, sender, content, created_at"
+
+
+def _timestamp(value: str | None) -> str:
+    """
+    created_at as fixed-width ISO 8601 in UTC, so text order is time order.
+    """
+    moment = datetime.fromisoformat(value) if value else datetime.now(timezone.utc)
+
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+
+    return moment.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _message(row: sqlite3.Row) -> dict:
+    message = dict(row)
+
+    if "approved" in message and message["approved"] is not None:
+        message["approved"] = bool(message["approved"])
+
+    return message
+
+
+class SQLiteStorage:
+    """
+    ChatStorage on a local SQLite file, for single-node deployments and
+    tests: no network hop per query.
+
+    One connection in WAL mode guarded by a lock (the same approach as
+    BoundedSQLiteSaver); queries run on a worker thread via
+    asyncio.to_thread so the event loop never blocks on disk. Several
+    worker processes may share the file; WAL lets readers run alongside
+    the single writer.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30, cached_statements=256)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+        with self.lock, self.conn:
+            self.conn.executescript(SCHEMA)
+
+    # -------- sync implementation --------
+
+    def _insert_messages(self, rows: list[dict]) -> list[dict]:
+        stored = []
+
+        with self.lock, self.conn:
+            for row in rows:
+                cursor = self.conn.execute(INSERT_MESSAGE, (
+                    row["thread_id"],
+                    row["sender"],
+                    row["content"],
+                    row.get("approved"),
+                    _timestamp(row.get("created_at")),
+                ))
+                stored.append(_message(self.conn.execute(SELECT_MESSAGE, (cursor.lastrowid,)).fetchone()))
+
+        return stored
+
+    def _get_thread_context(self, thread_id: str, limit: int) -> dict:
+        with self.lock:
+            summary = self.conn.execute(SELECT_SUMMARY, (thread_id,)).fetchone()
+            count = self.conn.execute(SELECT_MESSAGE_COUNT, (thread_id,)).fetchone()
+            recent = self.conn.execute(SELECT_RECENT_VISIBLE, (thread_id, limit)).fetchall()
+
+        return {
+            "summary": summary["summary"] if summary else None,
+            "message_count": count["message_count"] if count else 0,
+            "messages": [_message(row) for row in reversed(recent)],
+        }
+
+    def _list_messages(self, thread_id, after, before, limit, newest_first, visible_only) -> list[dict]:
+        sql = "SELECT id, sender, content, approved, created_at FROM chat_messages WHERE thread_id = ?"
+        params: list = [thread_id]
+
+        if visible_only:
+            sql += " AND approved IS NOT 0"
+
+        # Row values compare lexicographically, matching the (created_at, id) index
+        if after is not None:
+            sql += " AND (created_at, id) > (?, ?)"
+            params += [_timestamp(after[0]), int(after[1])]
+
+        if before is not None:
+            sql += " AND (created_at, id) < (?, ?)"
+            params += [_timestamp(before[0]), int(before[1])]
+
+        direction = "DESC" if newest_first else "ASC"
+        sql += f" ORDER BY created_at {direction}, id {direction}"
+
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self.lock:
+            return [_message(row) for row in self.conn.execute(sql, params).fetchall()]
+
+    def _messages_since(self, thread_id: str, after_id: int | None, limit: int) -> list[dict]:
+        with self.lock:
+            rows = self.conn.execute(SELECT_SINCE, (thread_id, after_id if after_id is not None else 0, limit)).fetchall()
+
+        return [_message(row) for row in rows]
+
+    def _get_summary(self, thread_id: str) -> dict | None:
+        with self.lock:
+            row = self.conn.execute(SELECT_SUMMARY, (thread_id,)).fetchone()
+
+        return dict(row) if row else None
+
+    def _save_summary(self, thread_id, summary, last_message_id, last_message_at):
+        with self.lock, self.conn:
+            self.conn.execute(UPSERT_SUMMARY, (
+                thread_id,
+                summary,
+                last_message_id,
+                _timestamp(last_message_at) if last_message_at else None,
+            ))
+
+    def _set_feedback(self, message_id: int, approved: bool) -> dict | None:
+        with self.lock, self.conn:
+            row = self.conn.execute(UPDATE_FEEDBACK, (int(approved), message_id)).fetchone()
+
+        return dict(row) if row else None
+
+    def _list_threads(self, limit: int, before: list | None) -> list[dict]:
+        sql = "SELECT thread_id, title, message_count, last_activity_at FROM chat_threads"
+        params: list = []
+
+        if before is not None:
+            sql += " WHERE (last_activity_at, thread_id) < (?, ?)"
+            params += [_timestamp(before[0]), before[1]]
+
+        sql += " ORDER BY last_activity_at DESC, thread_id DESC LIMIT ?"
+        params.append(limit)
+
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(sql, params).fetchall()]
+
+    def _get_message_count(self, thread_id: str) -> int:
+        with self.lock:
+            row = self.conn.execute(SELECT_MESSAGE_COUNT, (thread_id,)).fetchone()
+
+        return row["message_count"] if row else 0
+
+    # -------- ChatStorage --------
+
+    async def insert_messages(self, rows: list[dict]) -> list[dict]:
+        return await asyncio.to_thread(self._insert_messages, rows)
+
+    async def get_thread_context(self, thread_id: str, limit: int) -> dict:
+        return await asyncio.to_thread(self._get_thread_context, thread_id, limit)
+
+    async def list_messages(self, thread_id: str,
+        after: list | None = None,
+        before: list | None = None,
+        limit: int | None = None,
+        newest_first: bool = False,
+        visible_only: bool = False) -> list[dict]:
+        return await asyncio.to_thread(
+            self._list_messages, thread_id, after, before, limit, newest_first, visible_only
+        )
+
+    async def messages_since(self, thread_id: str, after_id: int | None, limit: int) -> list[dict]:
+        return await asyncio.to_thread(self._messages_since, thread_id, after_id, limit)
+
+    async def get_summary(self, thread_id: str) -> dict | None:
+        return await asyncio.to_thread(self._get_summary, thread_id)
+
+    async def save_summary(self, thread_id: str, summary: str,
+        last_message_id: int | None = None,
+        last_message_at: str | None = None) -> None:
+        await asyncio.to_thread(self._save_summary, thread_id, summary, last_message_id, last_message_at)
+
+    async def set_feedback(self, message_id: int, approved: bool) -> dict | None:
+        return await asyncio.to_thread(self._set_feedback, message_id, approved)
+
+    async def list_threads(self, limit: int, before: list | None = None) -> list[dict]:
+        return await asyncio.to_thread(self._list_threads, limit, before)
+
+    async def get_message_count(self, thread_id: str) -> int:
+        return await asyncio.to_thread(self._get_message_count, thread_id)
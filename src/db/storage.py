@@ -0,0 +1,100 @@
+import os
+from functools import lru_cache
+from typing import Protocol
+
+
+# =========================
+# CONFIG
+# =========================
+
+# "supabase" (default) or "sqlite" for single-node deployments and tests
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase")
+
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "chat.sqlite")
+
+
+class ChatStorage(Protocol):
+    """
+    Persistence used by the chat API: messages, summaries, feedback and
+    the thread index.
+
+    Message rows are dicts with id, thread_id, sender, content, approved
+    and created_at. Keyset positions (`after` / `before`) are
+    [created_at, id] pairs, the same values the API cursors encode.
+    """
+
+    async def insert_messages(self, rows: list[dict]) -> list[dict]:
+        """
+        Inserts rows (created_at may be preset) and returns them as stored.
+        """
+        ...
+
+    async def get_thread_context(self, thread_id: str, limit: int) -> dict:
+        """
+        {"summary", "message_count", "messages"}: the last `limit` visible
+        messages, oldest first.
+        """
+        ...
+
+    async def list_messages(self, thread_id: str,
+        after: list | None = None,
+        before: list | None = None,
+        limit: int | None = None,
+        newest_first: bool = False,
+        visible_only: bool = False) -> list[dict]:
+        """
+        Messages of a thread ordered by (created_at, id). visible_only
+        leaves out rejected answers.
+        """
+        ...
+
+    async def messages_since(self, thread_id: str, after_id: int | None, limit: int) -> list[dict]:
+        """
+        Up to `limit` messages with id > after_id, in id order.
+        """
+        ...
+
+    async def get_summary(self, thread_id: str) -> dict | None:
+        """
+        {"summary", "last_message_id", "last_message_at"} or None.
+        """
+        ...
+
+    async def save_summary(self, thread_id: str, summary: str,
+        last_message_id: int | None = None,
+        last_message_at: str | None = None) -> None:
+        ...
+
+    async def set_feedback(self, message_id: int, approved: bool) -> dict | None:
+        """
+        Returns the updated message row (at least thread_id, sender,
+        content and created_at), or None if there is no such message.
+        """
+        ...
+
+    async def list_threads(self, limit: int, before: list | None = None) -> list[dict]:
+        """
+        Threads by (last_activity_at, thread_id) descending, strictly
+        before the `before` position.
+        """
+        ...
+
+    async def get_message_count(self, thread_id: str) -> int:
+        ...
+
+
+@lru_cache(maxsize=1)
+def get_storage() -> ChatStorage:
+    """
+    Returns the process-wide storage selected by STORAGE_BACKEND.
+    Nothing connects until the first query.
+    """
+    if STORAGE_BACKEND == "sqlite":
+        from src.db.sqlite_storage import SQLiteStorage
+        return SQLiteStorage(SQLITE_DB_PATH)
+
+    if STORAGE_BACKEND == "supabase":
+        from src.db.supabase_storage import SupabaseStorage
+        return SupabaseStorage()
+
+    raise RuntimeError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r} (use 'supabase' or 'sqlite')")
@@ -1,16 +1,59 @@
 import os
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from supabase import create_client, acreate_client, Client, AsyncClient
 
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
-if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
-    raise RuntimeError("Supabase environment variables not set")
+_supabase: Client | None = None
+_async_supabase: AsyncClient | None = None
 
-supabase: Client = create_client(
-    SUPABASE_URL,
-    SUPABASE_SERVICE_ROLE_KEY
-)
+
+def _require_settings():
+    # Checked on first use, so the app can be imported (and run on
+    # STORAGE_BACKEND=sqlite) without Supabase credentials
+    if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
+        raise RuntimeError("Supabase environment variables not set")
+
+
+def get_supabase() -> Client:
+    """
+    Returns the process-wide sync Supabase client, created on first use.
+    """
+    global _supabase
+
+    if _supabase is None:
+        _require_settings()
+        _supabase = create_client(
+            SUPABASE_URL,
+            SUPABASE_SERVICE_ROLE_KEY
+        )
+
+    return _supabase
+
+
+async def get_async_supabase() -> AsyncClient:
+    """
+    Returns the process-wide async Supabase client.
+    Created lazily because acreate_client must run inside the event loop.
+    """
+    global _async_supabase
+
+    if _async_supabase is None:
+        _require_settings()
+        _async_supabase = await acreate_client(
+            SUPABASE_URL,
+            SUPABASE_SERVICE_ROLE_KEY
+        )
+
+    return _async_supabase
+
+
+def __getattr__(name: str):
+    # `from src.db.supabase_client import supabase` keeps working
+    if name == "supabase":
+        return get_supabase()
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
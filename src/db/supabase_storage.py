@@ -0,0 +1,150 @@
+from src.db.supabase_client import get_async_supabase
+from src.db.pagination import keyset_filter
+
+
+class SupabaseStorage:
+    """
+    ChatStorage on the Supabase tables and RPCs in supabase/migrations.
+    """
+
+    async def insert_messages(self, rows: list[dict]) -> list[dict]:
+        db = await get_async_supabase()
+        res = await db.table("chat_messages").insert(rows).execute()
+        return res.data
+
+    async def get_thread_context(self, thread_id: str, limit: int) -> dict:
+        db = await get_async_supabase()
+
+        res = await db.rpc(
+            "get_thread_context",
+            {"p_thread_id": thread_id, "p_limit": limit}
+        ).execute()
+
+        data = res.data or {}
+
+        return {
+            "summary": data.get("summary"),
+            "message_count": data.get("message_count") or 0,
+            "messages": data.get("messages") or [],
+        }
+
+    async def list_messages(self, thread_id: str,
+        after: list | None = None,
+        before: list | None = None,
+        limit: int | None = None,
+        newest_first: bool = False,
+        visible_only: bool = False) -> list[dict]:
+        db = await get_async_supabase()
+
+        query = (
+            db
+            .table("chat_messages")
+            .select("id, sender, content, approved, created_at")
+            .eq("thread_id", thread_id)
+        )
+
+        if visible_only:
+            query = query.or_("approved.is.null,approved.eq.true")
+
+        if after is not None:
+            query = query.or_(keyset_filter("created_at", "id", after, "gt"))
+
+        if before is not None:
+            query = query.or_(keyset_filter("created_at", "id", before, "lt"))
+
+        query = query.order("created_at", desc=newest_first).order("id", desc=newest_first)
+
+        if limit is not None:
+            query = query.limit(limit)
+
+        res = await query.execute()
+        return res.data
+
+    async def messages_since(self, thread_id: str, after_id: int | None, limit: int) -> list[dict]:
+        db = await get_async_supabase()
+
+        query = (
+            db
+            .table("chat_messages")
+            .select("id, sender, content, created_at")
+            .eq("thread_id", thread_id)
+        )
+
+        if after_id is not None:
+            query = query.gt("id", after_id)
+
+        res = await query.order("id").limit(limit).execute()
+        return res.data
+
+    async def get_summary(self, thread_id: str) -> dict | None:
+        db = await get_async_supabase()
+
+        res = await (
+            db
+            .table("chat_summaries")
+            .select("summary, last_message_id, last_message_at")
+            .eq("thread_id", thread_id)
+            .execute()
+        )
+
+        return res.data[0] if res.data else None
+
+    async def save_summary(self, thread_id: str, summary: str,
+        last_message_id: int | None = None,
+        last_message_at: str | None = None) -> None:
+        db = await get_async_supabase()
+
+        row = {
+            "thread_id": thread_id,
+            "summary": summary
+        }
+
+        if last_message_id is not None:
+            row["last_message_id"] = last_message_id
+            row["last_message_at"] = last_message_at
+
+        await db.table("chat_summaries").upsert(row).execute()
+
+    async def set_feedback(self, message_id: int, approved: bool) -> dict | None:
+        db = await get_async_supabase()
+
+        res = await db.table("chat_messages").update(
+            {"approved": approved}
+        ).eq("id", message_id).execute()
+
+        return res.data[0] if res.data else None
+
+    async def list_threads(self, limit: int, before: list | None = None) -> list[dict]:
+        db = await get_async_supabase()
+
+        query = (
+            db
+            .table("chat_threads")
+            .select("thread_id, title, message_count, last_activity_at")
+        )
+
+        if before is not None:
+            query = query.or_(keyset_filter("last_activity_at", "thread_id", before, "lt"))
+
+        res = await (
+            query
+            .order("last_activity_at", desc=True)
+            .order("thread_id", desc=True)
+            .limit(limit)
+            .execute()
+        )
+
+        return res.data
+
+    async def get_message_count(self, thread_id: str) -> int:
+        db = await get_async_supabase()
+
+        res = await (
+            db
+            .table("chat_threads")
+            .select("message_count")
+            .eq("thread_id", thread_id)
+            .execute()
+        )
+
+        return res.data[0]["message_count"] if res.data else 0
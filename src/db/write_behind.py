@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from src.db.storage import get_storage
+
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# CONFIG
+# =========================
+
+# Opt-in: acknowledged messages live only in this process until flushed,
+# so a crash loses them, and with API_WORKERS > 1 other workers cannot
+# see them until the flush. Reads served by this process flush first.
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "0") == "1"
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "100"))
+WRITE_BEHIND_FLUSH_INTERVAL_SECONDS = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_SECONDS", "0.25"))
+
+# Past this many unpersisted rows, writers wait for a flush (backpressure)
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "5000"))
+
+
+class WriteBehindBuffer:
+    """
+    Buffers message inserts and writes them in bulk through the
+    configured storage, either when max_batch rows are waiting or every
+    flush_interval_seconds. `table` names the buffer in logs.
+
+    Ordering: rows get a strictly increasing client-side created_at when
+    enqueued and are flushed FIFO by a single flusher, so per-thread
+    order by created_at matches the order the handler saved them in.
+    Rows stay in the buffer until the insert succeeds; a failed flush is
+    retried on the next tick.
+    """
+
+    def __init__(self, table: str, max_batch: int, flush_interval_seconds: float, max_pending: int):
+        self.table = table
+        self.max_batch = max_batch
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending = max_pending
+
+        self._pending: list[tuple[float, dict]] = []
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._last_created_at: datetime | None = None
+
+        self.rows_enqueued = 0
+        self.rows_flushed = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.last_flush_latency_seconds = 0.0
+        self.max_flush_latency_seconds = 0.0
+        self._total_flush_latency_seconds = 0.0
+
+    # -------- lifecycle --------
+
+    def start(self):
+        """
+        Starts the periodic flusher on the running loop (idempotent).
+        """
+        loop = asyncio.get_running_loop()
+
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = loop.create_task(self._run(), name=f"write-behind-{self.table}")
+
+    async def stop(self):
+        """
+        Stops the flusher and writes everything still buffered.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        while self._pending:
+            if not await self.flush():
+                logger.error("Dropping %d unflushed %s rows on shutdown", len(self._pending), self.table)
+                break
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+            self._wakeup.clear()
+            await self.flush()
+
+    # -------- producer side --------
+
+    def _next_created_at(self) -> datetime:
+        now = datetime.now(timezone.utc)
+
+        if self._last_created_at is not None and now <= self._last_created_at:
+            now = self._last_created_at + timedelta(microseconds=1)
+
+        self._last_created_at = now
+        return now
+
+    async def add(self, row: dict) -> dict:
+        """
+        Buffers one row and returns it with its created_at filled in.
+        """
+        self.start()
+
+        row = {**row, "created_at": self._next_created_at().isoformat(timespec="microseconds")}
+        self._pending.append((time.time(), row))
+        self.rows_enqueued += 1
+
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+
+        if len(self._pending) > self.max_pending:
+            await self.flush()
+
+        return row
+
+    def pending_for_thread(self, thread_id: str) -> list[dict]:
+        """
+        Rows accepted for thread_id that may not be in the database yet.
+        """
+        return [row for _, row in self._pending if row.get("thread_id") == thread_id]
+
+    # -------- consumer side --------
+
+    async def flush(self) -> bool:
+        """
+        Writes buffered rows in batches of max_batch. Returns False if a
+        batch failed (the rows stay buffered for the next attempt).
+        """
+        async with self._flush_lock:
+            while self._pending:
+                batch = self._pending[:self.max_batch]
+                started = time.perf_counter()
+
+                try:
+                    await get_storage().insert_messages([row for _, row in batch])
+                except Exception:
+                    self.flush_failures += 1
+                    logger.exception("Write-behind flush of %d %s rows failed", len(batch), self.table)
+                    return False
+
+                latency = time.perf_counter() - started
+                del self._pending[:len(batch)]
+
+                self.flushes += 1
+                self.rows_flushed += len(batch)
+                self.last_flush_latency_seconds = latency
+                self.max_flush_latency_seconds = max(self.max_flush_latency_seconds, latency)
+                self._total_flush_latency_seconds += latency
+
+        return True
+
+    # -------- observability --------
+
+    def stats(self) -> dict:
+        oldest = self._pending[0][0] if self._pending else None
+
+        return {
+            "pending_rows": len(self._pending),
+            "oldest_pending_age_seconds": time.time() - oldest if oldest else 0.0,
+            "rows_enqueued": self.rows_enqueued,
+            "rows_flushed": self.rows_flushed,
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "last_flush_latency_seconds": self.last_flush_latency_seconds,
+            "avg_flush_latency_seconds": self._total_flush_latency_seconds / self.flushes if self.flushes else 0.0,
+            "max_flush_latency_seconds": self.max_flush_latency_seconds,
+        }
+
+
+message_writer = WriteBehindBuffer(
+    table="chat_messages",
+    max_batch=WRITE_BEHIND_MAX_BATCH,
+    flush_interval_seconds=WRITE_BEHIND_FLUSH_INTERVAL_SECONDS,
+    max_pending=WRITE_BEHIND_MAX_PENDING
+)
@@ -1,20 +1,54 @@
-from typing import Iterator, List
+import asyncio
+import os
+import time
+from typing import AsyncIterator, List
 
-from langchain.messages import HumanMessage, AIMessage
+from langchain.messages import AIMessage, AIMessageChunk, RemoveMessage, ToolMessage
 
 from src.agents.chat_agent.graph import create_chat_agent_graph
 from src.agents.chat_agent.states.chat_agent_state import ChatAgentState
-from src.db.supabase_client import supabase
+from src.db.storage import get_storage
+from src.db.write_behind import message_writer, WRITE_BEHIND_ENABLED
+from src.db.pagination import encode_cursor, decode_cursor, InvalidCursorError
+from src.cache.response_cache import response_cache
 from langchain.messages import SystemMessage
-from src.memory.summarizer import summarize_messages
-from fastapi import Request
+from src.memory.summarizer import asummarize_incremental
+from src.memory.summary_queue import summary_queue
+from src.memory.thread_counter import thread_counter
+from src.scheduling.thread_scheduler import thread_scheduler
+from src.scheduling.llm_scheduler import llm_scheduler, llm_priority, LLMOverloadedError, Priority
+from src.metrics.prometheus import trace_request, stage, record_stage
+from src.memory.context_loader import (
+    context_loader,
+    iter_history,
+    row_message_id,
+    rows_to_messages,
+    ThreadContext,
+)
+from fastapi import HTTPException, Request
 
 
 # =========================
 # CONFIG
 # =========================
 
-MAX_CONTEXT_MESSAGES = 8  # SAFE for 8k TPM models
+# Upper bound of new messages folded into the summary per run;
+# anything beyond is picked up by the next run
+SUMMARY_MAX_NEW_MESSAGES = 40
+
+SUMMARIZE_EVERY_MESSAGES = 8
+
+THREADS_PAGE_SIZE = 20
+THREADS_MAX_PAGE_SIZE = 100
+
+HISTORY_MAX_PAGE_SIZE = 200
+
+# "delta": when the checkpoint already holds the thread, send the graph
+#          only the new user message (and the current summary)
+# "full":  always send the reloaded history; the state reducer dedupes it
+GRAPH_INPUT_MODE = os.getenv("GRAPH_INPUT_MODE", "delta")
+
+SUMMARY_MESSAGE_ID = "conversation-summary"
 
 
 # =========================
@@ -28,237 +62,604 @@ graph = create_chat_agent_graph()
 # HELPERS
 # =========================
 
-def trim_history(messages: List):
+def parse_cursor(cursor: str, key_type: type = str) -> list:
     """
-    Keep only the last N messages to avoid token overflow.
+    decode_cursor for client-supplied cursors: a malformed one is a 400.
     """
-    return messages[-MAX_CONTEXT_MESSAGES:]
+    try:
+        return decode_cursor(cursor, key_type)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="invalid cursor") from None
 
 
-def load_history_from_db(thread_id: str):
+def summary_message(summary: str) -> SystemMessage:
     """
-    Load chat history from Supabase and convert to LangChain messages.
+    The summary as hidden system memory. The fixed id makes a newer
+    summary replace the old one in the graph state.
     """
-    res = (
-        supabase
-        .table("chat_messages")
-        .select("sender, content")
-        .eq("thread_id", thread_id)
-        .order("created_at")
-        .execute()
+    return SystemMessage(
+        content=f"Conversation memory: {summary}",
+        id=SUMMARY_MESSAGE_ID
     )
 
+
+def build_context_messages(context: ThreadContext) -> List:
+    """
+    Summary (as hidden system memory) + the recent messages.
+    chat_node packs them into the token budget.
+    """
     messages = []
 
-    for row in res.data:
-        if row["sender"] == "user":
-            messages.append(HumanMessage(content=row["content"]))
-        elif row["sender"] == "bot":
-            messages.append(AIMessage(content=row["content"]))
+    if context.summary:
+        messages.append(summary_message(context.summary))
 
-    return messages
+    messages.extend(rows_to_messages(context.messages))
 
+    return messages
 
-# =========================
-# NORMAL (NON-STREAM) CHAT
-# =========================
 
-def chat_agent_handler(thread_id: str, message: str):
+async def build_graph_input(thread_id: str, context: ThreadContext, user_row: dict) -> List:
     """
-    Chat handler with persistent memory (Supabase-backed).
-    Sends only trimmed context to the LLM.
+    Messages to pass into the graph for one turn.
+
+    The checkpoint keeps the conversation between turns, so once it holds
+    the thread only the new user message (and the current summary) is
+    sent. A thread without checkpoint state (new, pruned, expired) gets
+    the history loaded from Supabase instead.
     """
+    user_messages = rows_to_messages([user_row])
+
+    if GRAPH_INPUT_MODE == "delta":
+        snapshot = await graph.aget_state(
+            config={"configurable": {"thread_id": thread_id}}
+        )
+
+        if snapshot.values.get("messages"):
+            memory = [summary_message(context.summary)] if context.summary else []
+            return memory + user_messages
 
+    # The user row was saved after context was loaded; drop it if a
+    # cached context already picked it up
+    messages = build_context_messages(context)
+    return [m for m in messages if m.id != user_messages[0].id] + user_messages
 
 
-MAX_RECENT_MESSAGES = 6  # 👈 important
+async def save_message(thread_id: str, sender: str, content: str) -> dict:
+    """
+    Saves one chat message and keeps the hot-thread context cache in sync.
+    """
+    row = {
+        "thread_id": thread_id,
+        "sender": sender,
+        "content": content
+    }
 
-def chat_agent_handler(thread_id: str, message: str):
+    if WRITE_BEHIND_ENABLED:
+        # Buffered, written in bulk by message_writer
+        row = await message_writer.add(row)
+    else:
+        row = (await get_storage().insert_messages([row]))[0]
 
-    # 1️⃣ Load summary
-    summary = load_summary(thread_id)
+    context_loader.append(thread_id, row)
 
-    messages = []
+    return row
 
-    # 2️⃣ Inject summary as system memory (NOT visible)
-    if summary:
-        messages.append(
-            SystemMessage(content=f"Conversation memory: {summary}")
-        )
 
-    # 3️⃣ Load last N messages only
-    history = (
-        supabase
-        .table("chat_messages")
-        .select("sender, content")
-        .eq("thread_id", thread_id)
-        .order("created_at", desc=True)
-        .limit(MAX_RECENT_MESSAGES)
-        .execute()
+async def record_cached_answer(thread_id: str, messages: List, answer: str) -> dict:
+    """
+    Writes a cached answer into the checkpoint as if chat_node had
+    produced it, so the next turn sees the same conversation.
+    """
+    config = {"configurable": {"thread_id": thread_id}}
+
+    await graph.aupdate_state(
+        config,
+        {"messages": messages + [AIMessage(content=answer)]},
+        as_node="chat_node"
     )
 
-    for row in reversed(history.data):
-        if row["sender"] == "user":
-            messages.append(HumanMessage(content=row["content"]))
-        else:
-            messages.append(AIMessage(content=row["content"]))
+    return (await graph.aget_state(config)).values
 
-    # 4️⃣ Append new user message
-    messages.append(HumanMessage(content=message))
 
-    # 5️⃣ Save user message
-    supabase.table("chat_messages").insert({
-        "thread_id": thread_id,
-        "sender": "user",
-        "content": message
-    }).execute()
-
-    # 6️⃣ Call graph
-    state = graph.invoke(
-        {"messages": messages},
-        config={"configurable": {"thread_id": thread_id}}
-    )
+async def save_partial_answer(thread_id: str, partial: str):
+    """
+    Closes a streamed turn that was cancelled mid-generation: the
+    checkpoint gets results for tool calls that never ran and the
+    partial answer, so the next turn starts from a valid conversation,
+    and the partial answer is saved like a full one.
+    """
+    config = {"configurable": {"thread_id": thread_id}}
+
+    snapshot = await graph.aget_state(config)
+    messages = snapshot.values.get("messages") or []
+
+    if messages and getattr(messages[-1], "tool_calls", None):
+        await graph.aupdate_state(
+            config,
+            {"messages": [
+                ToolMessage(
+                    content="Cancelled: the user left before the tool finished.",
+                    tool_call_id=tool_call["id"],
+                    name=tool_call["name"]
+                )
+                for tool_call in messages[-1].tool_calls
+            ]},
+            as_node="tool_executer_node"
+        )
 
-    assistant_msg = state["messages"][-1].content
+    if partial.strip():
+        await graph.aupdate_state(
+            config,
+            {"messages": [AIMessage(content=partial)]},
+            as_node="chat_node"
+        )
 
-    # 7️⃣ Save assistant reply
-    supabase.table("chat_messages").insert({
-        "thread_id": thread_id,
-        "sender": "bot",
-        "content": assistant_msg
-    }).execute()
-
-    # 8️⃣ Periodically summarize (every ~8 messages)
-    total = (
-        supabase
-        .table("chat_messages")
-        .select("id", count="exact")
-        .eq("thread_id", thread_id)
-        .execute()
-    )
+        await save_message(thread_id, "bot", partial)
 
-    if total.count % 8 == 0:
-        recent_msgs = messages[-12:]
-        summary = summarize_messages(recent_msgs)
-        save_summary(thread_id, summary)
+    await schedule_summary_if_due(thread_id, added=2 if partial.strip() else 1)
 
-    return state
 
+def turn_messages(state: dict, user_message_id: str) -> List:
+    """
+    The messages the graph added after the user message of this turn.
+    """
+    messages = state["messages"]
+
+    for i in range(len(messages) - 1, -1, -1):
+        if messages[i].id == user_message_id:
+            return messages[i + 1:]
+
+    return messages[-1:]
 
 
 # =========================
-# STREAMING CHAT
+# NORMAL (NON-STREAM) CHAT
 # =========================
 
-def chat_streaming_handler(request: Request,
-    thread_id: str,
-    message: str) -> Iterator[str]:
+async def chat_agent_handler(thread_id: str, message: str):
     """
-    Streams tokens from the graph.
-    Saves the FULL assistant message only after streaming ends.
-    Uses trimmed context to avoid token overflow.
+    Chat handler with persistent memory (Supabase-backed).
+    Runs one turn per thread at a time; a repeat of an in-flight message
+    gets that turn's answer.
     """
+    async with thread_scheduler.turn(thread_id, message) as turn:
+        if turn.coalesced:
+            # The identical turn already saved and answered the message
+            return await chat_history_handler(thread_id)
 
-    # 1️⃣ Save user message immediately
-    supabase.table("chat_messages").insert({
-        "thread_id": thread_id,
-        "sender": "user",
-        "content": message
-    }).execute()
+        state = await run_chat_turn(thread_id, message)
+        turn.publish(state["messages"][-1].content)
+
+    return state
+
+
+async def run_chat_turn(thread_id: str, message: str):
+    """
+    One non-stream turn. Sends only trimmed context to the LLM.
+    """
+    # Rejected with 503 before the user message is persisted. A call shed
+    # later (e.g. after a tool round) fails before chat_node writes
+    # anything, so the checkpoint still ends on a valid user or tool
+    # message, as on the streaming path
+    llm_scheduler.check_admission(Priority.CHAT)
+
+    with trace_request("chat", thread_id=thread_id):
+
+        # 1️⃣ Load summary + last N messages (one RPC, or none for hot threads)
+        with stage("context_load"):
+            context = await context_loader.load(thread_id)
+            thread_counter.prime(thread_id, context.message_count)
+
+        # 2️⃣ Save user message
+        with stage("save_user_message"):
+            user_row = await save_message(thread_id, "user", message)
+
+        # 3️⃣ New message only, or summary + recent history for a cold checkpoint
+        with stage("graph_input"):
+            messages = await build_graph_input(thread_id, context, user_row)
+
+        # 4️⃣ Same prompt in the same context answered before: skip the LLM
+        cache_key = response_cache.key(message, context)
+        cached = response_cache.get(cache_key)
+
+        if cached is not None:
+            with stage("cache_hit"):
+                state = await record_cached_answer(thread_id, messages, cached)
+        else:
+            with stage("graph"):
+                state = await graph.ainvoke(
+                    {"messages": messages},
+                    config={"configurable": {"thread_id": thread_id}}
+                )
 
-    # 2️⃣ Load FULL history
-    history_messages = load_history_from_db(thread_id)
+            response_cache.store(
+                cache_key,
+                state["messages"][-1].content,
+                turn_messages(state, messages[-1].id)
+            )
 
-    # 3️⃣ Trim history for LLM
-    history_messages = trim_history(history_messages)
+        assistant_msg = state["messages"][-1].content
 
-    # 4️⃣ Append current user message
-    history_messages.append(HumanMessage(content=message))
+        # 5️⃣ Save assistant reply
+        with stage("save_bot_message"):
+            await save_message(thread_id, "bot", assistant_msg)
 
-    collected_chunks: List[str] = []
+        # 6️⃣ Periodically summarize (every ~8 messages)
+        with stage("summary_schedule"):
+            await schedule_summary_if_due(thread_id, added=2)
 
-    # 5️⃣ Stream from graph
-    for chunk, metadata in graph.stream(
+    return state
+
+
+
+# =========================
+# STREAMING CHAT
+# =========================
+
+async def stream_graph_events(thread_id: str, messages: List, turn: List) -> AsyncIterator[dict]:
+    """
+    Runs the graph for one turn and yields "token", "tool_start" and
+    "tool_end" events. Messages the nodes produce are appended to turn.
+    """
+    # Tokens from "messages", tool progress from "updates"
+    async for mode, payload in graph.astream(
         input={
-            "messages": history_messages
+            "messages": messages
         },
         config={
             "configurable": {
                 "thread_id": thread_id
             }
         },
-        stream_mode="messages"
+        stream_mode=["messages", "updates"]
     ):
-        if chunk and getattr(chunk, "content", None):
-            collected_chunks.append(chunk.content)
-            yield chunk.content
+        if mode == "messages":
+            chunk, metadata = payload
+
+            # Only the assistant's own tokens; tool output is not for the user
+            if metadata.get("langgraph_node") != "chat_node":
+                continue
+
+            if isinstance(chunk, AIMessageChunk) and chunk.content:
+                yield {"event": "token", "data": chunk.content}
+
+        elif mode == "updates":
+            for node, update in payload.items():
+                for msg in (update or {}).get("messages", []):
+                    turn.append(msg)
+
+                    if node == "chat_node" and getattr(msg, "tool_calls", None):
+                        for tool_call in msg.tool_calls:
+                            yield {"event": "tool_start", "data": tool_call["name"]}
+                    elif node == "tool_executer_node":
+                        yield {"event": "tool_end", "data": msg.name}
 
-    # 6️⃣ Save full assistant response after streaming
-    final_response = "".join(collected_chunks)
 
-    if final_response.strip():
-        supabase.table("chat_messages").insert({
-            "thread_id": thread_id,
-            "sender": "bot",
-            "content": final_response
-        }).execute()
+async def chat_streaming_handler(request: Request,
+    thread_id: str,
+    message: str) -> AsyncIterator[dict]:
+    """
+    Streams events from the graph as they are produced.
+
+    Yields dicts of the form {"event": ..., "data": ...} where event is one of
+    "token", "tool_start", "tool_end", "error" or "done".
+    Runs one turn per thread at a time; a repeat of an in-flight message
+    receives that turn's answer as a single token.
+    """
+    async with thread_scheduler.turn(thread_id, message) as turn:
+        if turn.coalesced:
+            yield {"event": "token", "data": turn.answer}
+            yield {"event": "done", "data": turn.answer}
+            return
+
+        async for event in stream_chat_turn(request, thread_id, message):
+            if event["event"] == "done":
+                turn.publish(event["data"])
+
+            yield event
+
+
+async def stream_chat_turn(request: Request,
+    thread_id: str,
+    message: str) -> AsyncIterator[dict]:
+    """
+    One streamed turn.
+    Saves the FULL assistant message only after streaming ends.
+    Uses trimmed context to avoid token overflow.
+    """
+
+    with trace_request("chat_stream", thread_id=thread_id):
+
+        # 1️⃣ Load summary + last N messages only (before saving, so the new
+        # message is not doubled)
+        with stage("context_load"):
+            context = await context_loader.load(thread_id)
+            thread_counter.prime(thread_id, context.message_count)
+
+        # 2️⃣ Save user message
+        with stage("save_user_message"):
+            user_row = await save_message(thread_id, "user", message)
+
+        # 3️⃣ New message only, or summary + recent history for a cold checkpoint
+        with stage("graph_input"):
+            history_messages = await build_graph_input(thread_id, context, user_row)
+
+        # 4️⃣ Same prompt in the same context answered before: skip the LLM
+        cache_key = response_cache.key(message, context)
+        cached = response_cache.get(cache_key)
+
+        collected_chunks: List[str] = []
+        started = time.perf_counter()
+
+        if cached is not None:
+            with stage("cache_hit"):
+                await record_cached_answer(thread_id, history_messages, cached)
+
+            record_stage("first_token", time.perf_counter() - started)
+            collected_chunks.append(cached)
+            yield {"event": "token", "data": cached}
+
+        else:
+            turn: List = []
+
+            # Stream from graph (the "graph" stage includes the time the
+            # client takes to read); its LLM calls get the budget first
+            try:
+                with stage("graph"), llm_priority(Priority.STREAM):
+                    async for event in stream_graph_events(thread_id, history_messages, turn):
+                        if event["event"] == "token":
+                            if not collected_chunks:
+                                record_stage("first_token", time.perf_counter() - started)
+
+                            collected_chunks.append(event["data"])
+
+                        yield event
+            except LLMOverloadedError as e:
+                # Shed mid-turn (e.g. the call after a tool): end the stream cleanly
+                yield {"event": "error", "data": str(e)}
+            except asyncio.CancelledError:
+                # The client left and did not come back (see
+                # resumable_stream): graph.astream, the Groq request and
+                # pending tool calls are cancelled; keep what was generated
+                with stage("save_partial_answer"):
+                    await save_partial_answer(thread_id, "".join(collected_chunks))
+                raise
+            else:
+                response_cache.store(cache_key, "".join(collected_chunks), turn)
+
+        # 5️⃣ Save full assistant response after streaming
+        final_response = "".join(collected_chunks)
+
+        if final_response.strip():
+            with stage("save_bot_message"):
+                await save_message(thread_id, "bot", final_response)
+
+        # 6️⃣ Periodically summarize (every ~8 messages)
+        with stage("summary_schedule"):
+            await schedule_summary_if_due(
+                thread_id,
+                added=2 if final_response.strip() else 1
+            )
+
+        yield {"event": "done", "data": final_response}
 
 
 # =========================
 # THREAD HELPERS
 # =========================
 
-def get_all_threads_handler() -> list[str | None]:
+async def get_all_threads_handler(limit: int = THREADS_PAGE_SIZE, cursor: str | None = None) -> dict:
+    """
+    Returns one page of threads from the chat_threads index, most
+    recently active first, plus the cursor of the next page (or None).
+    """
+    if WRITE_BEHIND_ENABLED:
+        await message_writer.flush()
+
+    # Keyset pagination on (last_activity_at, thread_id)
+    rows = await get_storage().list_threads(
+        limit + 1,
+        before=parse_cursor(cursor) if cursor else None
+    )
+
+    threads = rows[:limit]
+    has_more = len(rows) > limit
+
+    return {
+        "threads": threads,
+        "next_cursor": (
+            encode_cursor(threads[-1]["last_activity_at"], threads[-1]["thread_id"])
+            if has_more else None
+        )
+    }
+
+
+async def chat_history_db_handler(thread_id: str,
+    limit: int | None = None,
+    before: str | None = None,
+    after: str | None = None) -> tuple[list[dict], str | None]:
     """
-    Returns all thread IDs from LangGraph checkpoints.
+    Visible messages of a thread from the database, oldest first, using
+    keyset pagination on (created_at, id).
+
+    - no arguments: the whole thread (legacy behaviour)
+    - limit: the newest `limit` messages; the returned cursor pages back
+      to older ones (pass it as `before`)
+    - before: messages older than the cursor
+    - after: only messages newer than the cursor (incremental sync); the
+      returned cursor is the position to sync from next time
+
+    Returns (rows, cursor).
     """
-    all_checkpoints = graph.checkpointer.list(config={})
-    threads = set()
+    # Read-your-writes: buffered messages of this process go first
+    if WRITE_BEHIND_ENABLED:
+        await message_writer.flush()
+
+    storage = get_storage()
+
+    if after:
+        rows = await storage.list_messages(
+            thread_id,
+            after=parse_cursor(after, int),
+            limit=limit or HISTORY_MAX_PAGE_SIZE,
+            visible_only=True
+        )
+        cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if rows else after
+        return rows, cursor
 
-    for checkpoint in all_checkpoints:
-        threads.add(checkpoint.config["configurable"]["thread_id"])
+    if limit is None and before is None:
+        # Paged, so long threads do not hit the API's per-query row cap
+        return [row async for row in iter_history(thread_id, visible_only=True)], None
 
-    return list(threads)
+    page_size = limit or HISTORY_MAX_PAGE_SIZE
 
+    newest = await storage.list_messages(
+        thread_id,
+        before=parse_cursor(before, int) if before else None,
+        limit=page_size + 1,
+        newest_first=True,
+        visible_only=True
+    )
 
-def chat_history_handler(thread_id: str) -> ChatAgentState | dict[None, None]:
+    rows = newest[:page_size]
+    has_more = len(newest) > page_size
+    rows.reverse()
+
+    cursor = encode_cursor(rows[0]["created_at"], rows[0]["id"]) if has_more else None
+    return rows, cursor
+
+
+async def chat_history_handler(thread_id: str) -> ChatAgentState | dict[None, None]:
     """
     Returns in-memory graph history for a thread.
     """
-    return graph.get_state(
+    snapshot = await graph.aget_state(
         config={
             "configurable": {
                 "thread_id": thread_id
             }
         }
-    )[0]
-
-def load_summary(thread_id: str) -> str | None:
-    res = (
-        supabase
-        .table("chat_summaries")
-        .select("summary")
-        .eq("thread_id", thread_id)
-        .execute()
     )
+    return snapshot[0]
+
+async def load_summary(thread_id: str) -> str | None:
+    state = await load_summary_state(thread_id)
 
-    if not res.data:
+    if not state:
         return None
 
-    return res.data[0]["summary"]
+    return state["summary"]
 
 
 
-def save_summary(thread_id: str, summary: str):
-    supabase.table("chat_summaries").upsert({
-        "thread_id": thread_id,
-        "summary": summary
-    }).execute()
+async def load_summary_state(thread_id: str) -> dict | None:
+    """
+    Returns the summary row including its high-water mark
+    (last_message_id / last_message_at), or None.
+    """
+    return await get_storage().get_summary(thread_id)
+
+
+async def save_summary(thread_id: str, summary: str,
+    last_message_id: int | None = None,
+    last_message_at: str | None = None):
+    await get_storage().save_summary(
+        thread_id,
+        summary,
+        last_message_id=last_message_id,
+        last_message_at=last_message_at
+    )
+
+    context_loader.set_summary(thread_id, summary)
+
+
+async def schedule_summary_if_due(thread_id: str, added: int):
+    """
+    Updates the per-thread counter for `added` saved messages and queues
+    a summary whenever the count crosses a multiple of
+    SUMMARIZE_EVERY_MESSAGES. No database query once the thread is cached.
+    """
+    before, after = await thread_counter.record(thread_id, added)
+
+    if before // SUMMARIZE_EVERY_MESSAGES != after // SUMMARIZE_EVERY_MESSAGES:
+        # Off the request path: the reply is returned immediately
+        summary_queue.submit(
+            thread_id,
+            lambda: summarize_and_save(thread_id)
+        )
+
 
-def mark_message_feedback(message_id: int, approved: bool):
+async def summarize_and_save(thread_id: str):
+    """
+    Background summarization job run by summary_queue.
+
+    Folds only the messages after the stored high-water mark into the
+    previous summary; does nothing when no new messages exist.
+    """
+    # The turn that queued this job may still sit in the write-behind buffer
+    if WRITE_BEHIND_ENABLED:
+        await message_writer.flush()
+
+    state = await load_summary_state(thread_id) or {}
+
+    rows = await get_storage().messages_since(
+        thread_id,
+        state.get("last_message_id"),
+        SUMMARY_MAX_NEW_MESSAGES
+    )
+
+    if not rows:
+        return
+
+    with stage("summary"):
+        summary = await asummarize_incremental(state.get("summary"), rows_to_messages(rows))
+
+    await save_summary(
+        thread_id,
+        summary,
+        last_message_id=rows[-1]["id"],
+        last_message_at=rows[-1]["created_at"]
+    )
+
+async def mark_message_feedback(message_id: int, approved: bool):
     """
     Human-in-the-loop feedback for AI answers.
     """
-    supabase.table("chat_messages").update(
-        {"approved": approved}
-    ).eq("id", message_id).execute()
+    row = await get_storage().set_feedback(message_id, approved)
+
+    if row is None:
+        return
+
+    # Rejected answers drop out of the reloaded history...
+    context_loader.invalidate(row["thread_id"])
+
+    # ...and out of the checkpoint, which is all delta-mode turns send
+    if not approved and row["sender"] == "bot":
+        await remove_from_checkpoint(row)
+
+
+async def remove_from_checkpoint(row: dict):
+    """
+    Deletes a stored answer from the thread's graph state. The graph
+    holds its own copy under the LLM's message id unless the row was
+    re-sent as history, so the copy is found by row id, else as the
+    newest final AI message with the same content.
+    """
+    config = {"configurable": {"thread_id": row["thread_id"]}}
+    snapshot = await graph.aget_state(config)
+    messages = snapshot.values.get("messages") or []
+
+    target = next((m for m in messages if m.id == row_message_id(row)), None) or next(
+        (
+            m for m in reversed(messages)
+            if m.type == "ai" and m.content == row["content"] and not getattr(m, "tool_calls", None)
+        ),
+        None
+    )
+
+    if target is not None:
+        await graph.aupdate_state(
+            config,
+            {"messages": [RemoveMessage(id=target.id)]},
+            as_node="chat_node"
+        )
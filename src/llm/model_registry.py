@@ -0,0 +1,113 @@
+import os
+from functools import lru_cache
+
+import httpx
+from dotenv import load_dotenv
+from langchain.chat_models import init_chat_model
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_groq import ChatGroq
+
+
+load_dotenv()
+
+
+# =========================
+# CONFIG
+# =========================
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+
+CHAT_MODEL_NAME = os.getenv("CHAT_MODEL_NAME", "openai/gpt-oss-120b")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+# Used when the primary model times out or is rate limited: a Groq model
+# name, or "provider:model" for another provider (its langchain
+# integration package and API key must be installed / set)
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL")
+
+# Connection pool shared by every model built here
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "60"))
+
+
+# =========================
+# HTTP CLIENTS
+# =========================
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY_SECONDS
+    )
+
+
+@lru_cache(maxsize=1)
+def get_http_client() -> httpx.Client:
+    """
+    Process-wide sync HTTP client, keeps TLS connections to Groq alive.
+    """
+    return httpx.Client(limits=_limits(), timeout=LLM_TIMEOUT_SECONDS)
+
+
+@lru_cache(maxsize=1)
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Process-wide async HTTP client, keeps TLS connections to Groq alive.
+    """
+    return httpx.AsyncClient(limits=_limits(), timeout=LLM_TIMEOUT_SECONDS)
+
+
+# =========================
+# MODELS
+# =========================
+
+@lru_cache(maxsize=None)
+def get_chat_model(model_name: str | None = None, temperature: float | None = None) -> ChatGroq:
+    """
+    Returns a cached ChatGroq instance for (model_name, temperature).
+    All instances share the same HTTP connection pool.
+    """
+    kwargs = {}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+
+    return ChatGroq(
+        model=model_name or CHAT_MODEL_NAME,
+        api_key=GROQ_API_KEY,
+        timeout=LLM_TIMEOUT_SECONDS,
+        max_retries=LLM_MAX_RETRIES,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+        **kwargs
+    )
+
+
+@lru_cache(maxsize=None)
+def get_fallback_model(temperature: float | None = None) -> BaseChatModel | None:
+    """
+    Returns the configured fallback model, or None when LLM_FALLBACK_MODEL
+    is unset.
+    """
+    if not LLM_FALLBACK_MODEL:
+        return None
+
+    provider, sep, model_name = LLM_FALLBACK_MODEL.partition(":")
+
+    if not sep or provider == "groq":
+        # Another Groq model shares the pooled clients
+        return get_chat_model(model_name if sep else LLM_FALLBACK_MODEL, temperature)
+
+    kwargs = {}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+
+    return init_chat_model(
+        model_name,
+        model_provider=provider,
+        timeout=LLM_TIMEOUT_SECONDS,
+        max_retries=LLM_MAX_RETRIES,
+        **kwargs
+    )
@@ -0,0 +1,314 @@
+import asyncio
+import os
+import time
+from collections import deque
+from functools import lru_cache
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.messages.utils import message_chunk_to_message
+
+from src.llm.model_registry import get_chat_model, get_fallback_model
+from src.memory.context_builder import context_builder
+from src.metrics import prometheus
+from src.scheduling.llm_scheduler import current_priority, llm_scheduler, LLMCall, Priority
+
+
+# =========================
+# CONFIG
+# =========================
+
+# Off by default: a hedge spends extra tokens of the ~8k TPM budget
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "0") == "1"
+
+# A second request starts once the first has run longer than this
+# percentile of recent primary latencies
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+
+# Hedge delay until enough latencies are observed, and its lower bound
+LLM_HEDGE_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_DELAY_SECONDS", "3"))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "0.5"))
+
+LLM_HEDGE_MIN_SAMPLES = 20
+LLM_LATENCY_WINDOW = 200
+
+# Time an attempt gets before the fallback model takes over (time to
+# first token for streamed calls). Not applied to the last model
+LLM_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "20"))
+
+# Upstream statuses worth retrying on another model
+FALLBACK_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+LLM_ATTEMPT_SECONDS = prometheus.histogram(
+    "chat_llm_attempt_seconds",
+    "Duration of each LLM attempt by model, role (primary, hedge, fallback) and outcome",
+    ("model", "role", "outcome")
+)
+
+LLM_HEDGES_SKIPPED = prometheus.counter(
+    "chat_llm_hedges_skipped_total",
+    "Hedges not sent because the token budget could not cover them",
+    ()
+)
+
+
+def should_fall_back(error: BaseException) -> bool:
+    """
+    Timeouts, rate limits, upstream 5xx and connection failures.
+    """
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+
+    if getattr(error, "status_code", None) in FALLBACK_STATUS_CODES:
+        return True
+
+    # groq / openai SDK errors without a status code
+    return type(error).__name__ in ("APITimeoutError", "APIConnectionError")
+
+
+def _outcome(error: BaseException) -> str:
+    if isinstance(error, asyncio.CancelledError):
+        return "cancelled"
+
+    if isinstance(error, asyncio.TimeoutError) or type(error).__name__ == "APITimeoutError":
+        return "timeout"
+
+    if getattr(error, "status_code", None) == 429:
+        return "rate_limited"
+
+    return "error"
+
+
+def _input_tokens(messages) -> int:
+    return sum(context_builder.count(m) for m in messages)
+
+
+def _model_label(model) -> str:
+    # bind_tools returns a RunnableBinding around the chat model
+    inner = getattr(model, "bound", model)
+    return getattr(inner, "model_name", None) or type(inner).__name__
+
+
+class LatencyTracker:
+    """
+    Rolling window of successful primary latencies.
+    """
+
+    def __init__(self, window: int):
+        self.samples: deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> float | None:
+        if len(self.samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class ResilientChatModel:
+    """
+    Chat model wrapper that keeps one slow or failing upstream call from
+    stalling the turn.
+
+    - Hedging: when the primary has not answered within the
+      LLM_HEDGE_PERCENTILE latency, an identical second request starts;
+      the first answer wins and the loser is cancelled.
+    - Fallback: on timeout, rate limit, 5xx or connection errors the
+      next model (LLM_FALLBACK_MODEL) is tried.
+
+    Streamed turns (Priority.STREAM) send tokens to the client as they
+    arrive, so they are never hedged, and fall back only while no token
+    has been produced yet.
+
+    Token budget: the caller's llm_scheduler reservation covers one
+    attempt. A hedge reserves its own tokens and is skipped when the
+    bucket cannot cover it right away; the prompt of a failed attempt is
+    charged before falling back.
+
+    Every attempt is timed into chat_llm_attempt_seconds.
+    """
+
+    def __init__(self, primary, fallbacks: list | tuple = (),
+        hedge: bool = False,
+        attempt_timeout: float = LLM_ATTEMPT_TIMEOUT_SECONDS,
+        latency: LatencyTracker | None = None):
+        self.primary = primary
+        self.fallbacks = list(fallbacks)
+        self.hedge = hedge
+        self.attempt_timeout = attempt_timeout
+        self.latency = latency or LatencyTracker(LLM_LATENCY_WINDOW)
+
+    def bind_tools(self, tools, **kwargs) -> "ResilientChatModel":
+        return ResilientChatModel(
+            self.primary.bind_tools(tools, **kwargs),
+            [model.bind_tools(tools, **kwargs) for model in self.fallbacks],
+            hedge=self.hedge,
+            attempt_timeout=self.attempt_timeout,
+            latency=self.latency
+        )
+
+    def hedge_delay(self) -> float:
+        observed = self.latency.percentile(LLM_HEDGE_PERCENTILE)
+
+        return max(
+            LLM_HEDGE_MIN_DELAY_SECONDS,
+            observed if observed is not None else LLM_HEDGE_DELAY_SECONDS
+        )
+
+    # -------- attempts --------
+
+    async def _stream_once(self, model, messages, timeout, progress: dict, **kwargs) -> AIMessage:
+        stream = model.astream(messages, **kwargs)
+
+        try:
+            # Only the first token is bounded: after it the client is reading
+            merged = await asyncio.wait_for(anext(stream), timeout)
+            progress["streamed"] = True
+
+            async for chunk in stream:
+                merged += chunk
+        finally:
+            await stream.aclose()
+
+        return message_chunk_to_message(merged)
+
+    async def _attempt(self, model, messages, role: str, timeout: float | None,
+        progress: dict | None = None, reservation: LLMCall | None = None, **kwargs) -> AIMessage:
+        started = time.perf_counter()
+
+        try:
+            if progress is not None:
+                message = await self._stream_once(model, messages, timeout, progress, **kwargs)
+            else:
+                message = await asyncio.wait_for(model.ainvoke(messages, **kwargs), timeout)
+        except BaseException as e:
+            LLM_ATTEMPT_SECONDS.observe(
+                time.perf_counter() - started, model=_model_label(model), role=role, outcome=_outcome(e)
+            )
+
+            if reservation is not None:
+                reservation.settle(None)
+            raise
+
+        if reservation is not None:
+            reservation.settle(message)
+
+        elapsed = time.perf_counter() - started
+        LLM_ATTEMPT_SECONDS.observe(elapsed, model=_model_label(model), role=role, outcome="ok")
+
+        if role == "primary":
+            self.latency.observe(elapsed)
+
+        return message
+
+    async def _hedged(self, model, messages, timeout: float | None, **kwargs) -> AIMessage:
+        """
+        Primary attempt, plus a hedge once it runs past hedge_delay().
+        """
+        tasks = {asyncio.create_task(self._attempt(model, messages, "primary", timeout, **kwargs))}
+
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+
+            if not done:
+                # The hedge is a second full request: it needs its own budget
+                reservation = llm_scheduler.try_reserve(_input_tokens(messages))
+
+                if reservation is None:
+                    LLM_HEDGES_SKIPPED.inc()
+                else:
+                    tasks.add(asyncio.create_task(self._attempt(
+                        model, messages, "hedge", timeout, reservation=reservation, **kwargs
+                    )))
+
+            error = None
+
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+
+                    error = error or task.exception()
+
+            raise error
+        finally:
+            # The loser (or both, if the caller was cancelled)
+            for task in tasks:
+                task.cancel()
+
+    # -------- chat model interface --------
+
+    async def ainvoke(self, messages, **kwargs) -> AIMessage:
+        streamed = current_priority() == Priority.STREAM
+        models = [self.primary] + self.fallbacks
+
+        for i, model in enumerate(models):
+            last = i == len(models) - 1
+            timeout = None if last else self.attempt_timeout
+            role = "primary" if i == 0 else "fallback"
+            progress = {"streamed": False} if streamed else None
+
+            try:
+                if streamed:
+                    return await self._attempt(model, messages, role, timeout, progress, **kwargs)
+
+                if i == 0 and self.hedge:
+                    return await self._hedged(model, messages, timeout, **kwargs)
+
+                return await self._attempt(model, messages, role, timeout, **kwargs)
+            except Exception as e:
+                if last or not should_fall_back(e) or (progress and progress["streamed"]):
+                    raise
+
+                # The caller's reservation now pays for the fallback
+                llm_scheduler.charge(_input_tokens(messages))
+
+    def invoke(self, messages, **kwargs) -> AIMessage:
+        """
+        Sync path (graph.invoke): fallback on errors, no hedging or
+        attempt timeout.
+        """
+        models = [self.primary] + self.fallbacks
+
+        for i, model in enumerate(models):
+            role = "primary" if i == 0 else "fallback"
+            started = time.perf_counter()
+
+            try:
+                message = model.invoke(messages, **kwargs)
+            except Exception as e:
+                LLM_ATTEMPT_SECONDS.observe(
+                    time.perf_counter() - started, model=_model_label(model), role=role, outcome=_outcome(e)
+                )
+
+                if i == len(models) - 1 or not should_fall_back(e):
+                    raise
+
+                llm_scheduler.charge(_input_tokens(messages))
+                continue
+
+            LLM_ATTEMPT_SECONDS.observe(
+                time.perf_counter() - started, model=_model_label(model), role=role, outcome="ok"
+            )
+            return message
+
+
+@lru_cache(maxsize=None)
+def get_resilient_chat_model(temperature: float | None = None) -> ResilientChatModel:
+    """
+    The chat model with hedging (LLM_HEDGE_ENABLED) and the configured
+    fallback model, if any.
+    """
+    fallback: BaseChatModel | None = get_fallback_model(temperature)
+
+    return ResilientChatModel(
+        get_chat_model(temperature=temperature),
+        [fallback] if fallback is not None else [],
+        hedge=LLM_HEDGE_ENABLED
+    )
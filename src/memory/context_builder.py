@@ -0,0 +1,137 @@
+import json
+import os
+from collections import OrderedDict
+
+from langchain.messages import AnyMessage, SystemMessage
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character estimate
+    tiktoken = None
+
+
+# =========================
+# CONFIG
+# =========================
+
+# Input tokens allowed per LLM call (the model is limited to ~8k TPM)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+
+# Rough per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+TOKEN_CACHE_MAX_ENTRIES = 20_000
+
+
+_encoding = tiktoken.get_encoding("o200k_base") if tiktoken is not None else None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Token count of text: tiktoken when installed, otherwise ~4 chars/token.
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+
+    return (len(text) + 3) // 4
+
+
+class ContextBuilder:
+    """
+    Packs the messages of one LLM call into a token budget.
+
+    Always kept: the leading system prompt, the latest other system
+    message (the conversation summary) and the current turn. The rest of
+    the budget is filled with the most recent messages, newest first, so
+    one 4,000-token message costs as much as it really does instead of
+    counting as "one message".
+
+    Token counts are cached per message content, so a turn only tokenizes
+    the messages it has not seen before.
+    """
+
+    def __init__(self, budget_tokens: int, max_cache_entries: int = TOKEN_CACHE_MAX_ENTRIES):
+        self.budget_tokens = budget_tokens
+        self.max_cache_entries = max_cache_entries
+        self._cache: OrderedDict[tuple, int] = OrderedDict()
+
+    def count(self, message: AnyMessage) -> int:
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+        tool_calls = getattr(message, "tool_calls", None)
+        key = (message.type, content, json.dumps(tool_calls) if tool_calls else None)
+
+        tokens = self._cache.get(key)
+
+        if tokens is not None:
+            self._cache.move_to_end(key)
+            return tokens
+
+        tokens = estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+        if tool_calls:
+            tokens += estimate_tokens(key[2])
+
+        self._cache[key] = tokens
+        if len(self._cache) > self.max_cache_entries:
+            self._cache.popitem(last=False)
+
+        return tokens
+
+    def build(self, messages: list[AnyMessage], budget_tokens: int | None = None) -> list[AnyMessage]:
+        """
+        Returns the subset of messages (original order) that fits the budget.
+        """
+        budget = budget_tokens or self.budget_tokens
+
+        if not messages:
+            return []
+
+        head = []
+        body = list(messages)
+
+        # Pinned: system prompt, latest summary, current turn
+        if body and isinstance(body[0], SystemMessage):
+            head.append(body.pop(0))
+
+        summaries = [m for m in body if isinstance(m, SystemMessage)]
+        body = [m for m in body if not isinstance(m, SystemMessage)]
+        if summaries:
+            head.append(summaries[-1])
+
+        # The current turn (last user message and any tool round trips
+        # after it) is pinned whole, so tool calls keep their results
+        turn_start = max(
+            (i for i, m in enumerate(body) if m.type == "human"),
+            default=max(len(body) - 1, 0)
+        )
+        turn = body[turn_start:]
+        body = body[:turn_start]
+        pinned = head + turn
+
+        remaining = budget - sum(self.count(m) for m in pinned)
+        kept = []
+
+        for message in reversed(body):
+            tokens = self.count(message)
+            if tokens > remaining:
+                break
+            kept.append(message)
+            remaining -= tokens
+
+        kept.reverse()
+
+        # A tool result without the assistant message that requested it is
+        # rejected by the API, so never start the window with one
+        while kept and kept[0].type == "tool":
+            kept.pop(0)
+
+        return head + kept + turn
+
+    def stats(self) -> dict:
+        return {
+            "cached_messages": len(self._cache),
+            "budget_tokens": self.budget_tokens,
+            "tokenizer": "tiktoken" if _encoding is not None else "estimate",
+        }
+
+
+context_builder = ContextBuilder(budget_tokens=CONTEXT_TOKEN_BUDGET)
@@ -0,0 +1,215 @@
+import os
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+from langchain.messages import HumanMessage, AIMessage
+
+from src.config import single_worker_flag
+from src.db.storage import get_storage
+from src.db.write_behind import message_writer
+
+
+# =========================
+# CONFIG
+# =========================
+
+# Upper bound on rows fetched per turn; what actually reaches the LLM is
+# decided by the token budget in context_builder
+CONTEXT_FETCH_MESSAGES = int(os.getenv("CONTEXT_FETCH_MESSAGES", "24"))
+
+# Page size of iter_history when the full thread really is needed
+HISTORY_PAGE_SIZE = 200
+CONTEXT_CACHE_MAX_THREADS = 2_000
+
+# A worker's cache misses turns served by the others and goes stale
+CONTEXT_CACHE_ENABLED = single_worker_flag("CONTEXT_CACHE_ENABLED")
+
+ROW_MESSAGE_ID_PREFIX = "row:"
+
+
+@dataclass
+class ThreadContext:
+    """
+    What a chat turn needs from storage: the rolling summary, the thread's
+    message count and the most recent messages (oldest first).
+    """
+    summary: str | None = None
+    message_count: int = 0
+    messages: list[dict] = field(default_factory=list)
+
+
+def normalize_timestamp(value: str) -> str:
+    """
+    created_at in one canonical form (UTC, six fractional digits).
+    Postgres drops trailing zeros from the microseconds, so the same
+    instant comes back as "...12.5+00:00" after being written as
+    "...12.500000+00:00".
+    """
+    moment = datetime.fromisoformat(value)
+
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+
+    return moment.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def row_message_id(row: dict) -> str:
+    """
+    Stable message id for a chat_messages row, from its normalized
+    created_at: the same before and after the write-behind flush.
+    """
+    return f"{ROW_MESSAGE_ID_PREFIX}{normalize_timestamp(row['created_at'])}"
+
+
+def rows_to_messages(rows: list[dict]) -> list:
+    """
+    Converts chat_messages rows to LangChain messages with stable ids, so
+    the graph state can recognise history it already holds.
+    """
+    messages = []
+
+    for row in rows:
+        message_id = row_message_id(row) if row.get("created_at") else None
+
+        if row["sender"] == "user":
+            messages.append(HumanMessage(content=row["content"], id=message_id))
+        elif row["sender"] == "bot":
+            messages.append(AIMessage(content=row["content"], id=message_id))
+
+    return messages
+
+
+async def iter_history(thread_id: str, page_size: int = HISTORY_PAGE_SIZE, visible_only: bool = False):
+    """
+    Lazily yields the full history of a thread as chat_messages rows,
+    oldest first, fetching page_size rows at a time (keyset on
+    created_at, id), so no single query is unbounded. Only for callers
+    that really need every message; building LLM context goes through
+    ContextLoader instead.
+    """
+    storage = get_storage()
+    last = None
+
+    while True:
+        rows = await storage.list_messages(
+            thread_id, after=last, limit=page_size, visible_only=visible_only
+        )
+
+        for row in rows:
+            yield row
+
+        if len(rows) < page_size:
+            return
+
+        last = [rows[-1]["created_at"], rows[-1]["id"]]
+
+
+class ContextLoader:
+    """
+    Loads ThreadContext with a single get_thread_context RPC and keeps an
+    LRU of hot threads in front of it.
+
+    Every insert goes through append(), so a thread that keeps chatting
+    costs no reads after its first message. mark_message_feedback and
+    save_summary keep the cache coherent via invalidate() and
+    set_summary().
+    """
+
+    def __init__(self, window: int, max_threads: int, enabled: bool = True):
+        self.window = window
+        self.max_threads = max_threads
+        self.enabled = enabled
+        self._cache: OrderedDict[str, ThreadContext] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    async def _fetch(self, thread_id: str) -> ThreadContext:
+        data = await get_storage().get_thread_context(thread_id, self.window)
+        messages = data["messages"]
+        message_count = data["message_count"]
+
+        # Rows accepted by the write-behind buffer but not flushed yet
+        stored = {normalize_timestamp(row["created_at"]) for row in messages}
+        unflushed = [
+            row for row in message_writer.pending_for_thread(thread_id)
+            if normalize_timestamp(row["created_at"]) not in stored
+        ]
+
+        return ThreadContext(
+            summary=data["summary"],
+            message_count=message_count + len(unflushed),
+            messages=(messages + unflushed)[-self.window:]
+        )
+
+    def _store(self, thread_id: str, context: ThreadContext):
+        if not self.enabled:
+            return
+
+        self._cache[thread_id] = context
+        self._cache.move_to_end(thread_id)
+
+        while len(self._cache) > self.max_threads:
+            self._cache.popitem(last=False)
+
+    async def load(self, thread_id: str) -> ThreadContext:
+        """
+        Returns a copy of the thread's context, from cache when hot.
+        """
+        context = self._cache.get(thread_id)
+
+        if context is not None:
+            self.hits += 1
+            self._cache.move_to_end(thread_id)
+        else:
+            self.misses += 1
+            context = await self._fetch(thread_id)
+            self._store(thread_id, context)
+
+        return ThreadContext(
+            summary=context.summary,
+            message_count=context.message_count,
+            messages=list(context.messages)
+        )
+
+    # -------- write hooks --------
+
+    def append(self, thread_id: str, row: dict):
+        """
+        Adds a freshly inserted chat_messages row to a cached thread.
+        Uncached threads are left alone and loaded on their next turn.
+        """
+        context = self._cache.get(thread_id)
+
+        if context is None:
+            return
+
+        context.messages.append(row)
+        del context.messages[:-self.window]
+        context.message_count += 1
+
+    def set_summary(self, thread_id: str, summary: str):
+        context = self._cache.get(thread_id)
+
+        if context is not None:
+            context.summary = summary
+
+    # -------- invalidation hooks --------
+
+    def invalidate(self, thread_id: str):
+        self._cache.pop(thread_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "threads": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+context_loader = ContextLoader(
+    window=CONTEXT_FETCH_MESSAGES,
+    max_threads=CONTEXT_CACHE_MAX_THREADS,
+    enabled=CONTEXT_CACHE_ENABLED
+)
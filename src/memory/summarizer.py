@@ -1,10 +1,10 @@
 from langchain.messages import SystemMessage, HumanMessage, AIMessage
-from langchain_groq import ChatGroq
+from src.llm.model_registry import get_chat_model
+from src.memory.context_builder import estimate_tokens
+from src.metrics.prometheus import record_llm_usage
+from src.scheduling.llm_scheduler import llm_scheduler, Priority
 
-model = ChatGroq(
-    model="openai/gpt-oss-120b",
-    temperature=0.2
-)
+model = get_chat_model(temperature=0.2)
 
 SUMMARY_PROMPT = SystemMessage(
     content="""
@@ -19,11 +19,23 @@ Your task:
 """
 )
 
-def summarize_messages(messages):
-    """
-    Takes a list of LangChain messages and returns a concise summary string.
-    """
+INCREMENTAL_SUMMARY_PROMPT = SystemMessage(
+    content="""
+You are a memory summarization assistant.
+
+You are given the existing memory of a conversation and the messages
+that happened after it.
+
+Your task:
+- Merge the new messages into the existing memory
+- Keep every important fact, preference, goal and decision from the existing memory unless the new messages contradict it
+- Remove small talk and filler
+- Write in plain sentences, not bullet points
+- Do NOT include timestamps or speaker labels
+"""
+)
 
+def _conversation_text(messages) -> str:
     convo_text = []
 
     for m in messages:
@@ -32,11 +44,86 @@ def summarize_messages(messages):
         elif isinstance(m, AIMessage):
             convo_text.append(f"Assistant: {m.content}")
 
-    response = model.invoke(
-        [
-            SUMMARY_PROMPT,
-            HumanMessage(content="\n".join(convo_text))
-        ]
-    )
+    return "\n".join(convo_text)
+
+
+def _build_prompt(messages):
+    """
+    Turns LangChain messages into the summarizer prompt.
+    """
+
+    return [
+        SUMMARY_PROMPT,
+        HumanMessage(content=_conversation_text(messages))
+    ]
+
+
+def _build_incremental_prompt(previous_summary, new_messages):
+    """
+    Prompt that folds only the new messages into the previous summary.
+    """
+
+    return [
+        INCREMENTAL_SUMMARY_PROMPT,
+        HumanMessage(
+            content=(
+                f"Existing memory:\n{previous_summary}\n\n"
+                f"New messages:\n{_conversation_text(new_messages)}"
+            )
+        )
+    ]
+
+
+def _prompt_tokens(prompt) -> int:
+    return sum(estimate_tokens(m.content) for m in prompt)
+
+
+def _invoke(prompt) -> str:
+    with llm_scheduler.call_blocking(_prompt_tokens(prompt)) as call:
+        response = model.invoke(prompt)
+        call.settle(response)
+
+    record_llm_usage("summary", response)
+
+    return response.content.strip()
+
+
+async def _ainvoke(prompt) -> str:
+    # Lowest priority: summaries yield the token budget to live chat
+    async with llm_scheduler.call(_prompt_tokens(prompt), priority=Priority.SUMMARY) as call:
+        response = await model.ainvoke(prompt)
+        call.settle(response)
+
+    record_llm_usage("summary", response)
 
     return response.content.strip()
+
+
+def summarize_messages(messages):
+    """
+    Takes a list of LangChain messages and returns a concise summary string.
+    """
+
+    return _invoke(_build_prompt(messages))
+
+
+async def asummarize_messages(messages):
+    """
+    Async variant of summarize_messages.
+    """
+
+    return await _ainvoke(_build_prompt(messages))
+
+
+async def asummarize_incremental(previous_summary, new_messages):
+    """
+    Returns previous_summary with new_messages folded in.
+    Falls back to a plain summary when there is no previous summary.
+    """
+
+    if not previous_summary:
+        return await asummarize_messages(new_messages)
+
+    return await _ainvoke(
+        _build_incremental_prompt(previous_summary, new_messages)
+    )
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# CONFIG
+# =========================
+
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "2"))
+SUMMARY_MAX_RETRIES = int(os.getenv("SUMMARY_MAX_RETRIES", "2"))
+SUMMARY_RETRY_BACKOFF_SECONDS = float(os.getenv("SUMMARY_RETRY_BACKOFF_SECONDS", "5"))
+
+
+SummaryJob = Callable[[], Awaitable[None]]
+
+
+@dataclass
+class _PendingJob:
+    job: SummaryJob
+    enqueued_at: float
+    attempts: int = 0
+
+
+class SummaryQueue:
+    """
+    Background summarization queue, one worker pool per process.
+
+    Jobs are keyed by thread_id: submitting a job for a thread that is
+    already waiting replaces it (the latest job wins) while keeping its
+    place in the queue. A thread is never summarized by two workers at
+    once. Failed jobs are retried up to max_retries times unless a newer
+    job for the same thread arrived in the meantime.
+    """
+
+    def __init__(self, workers: int, max_retries: int, retry_backoff_seconds: float):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+        self._pending: OrderedDict[str, _PendingJob] = OrderedDict()
+        self._in_flight: set[str] = set()
+        self._wakeup: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.superseded = 0
+        self.last_lag_seconds = 0.0
+
+    # -------- lifecycle --------
+
+    def start(self):
+        """
+        Starts the workers on the running loop (idempotent).
+        """
+        loop = asyncio.get_running_loop()
+
+        if self._loop is loop and self._tasks:
+            return
+
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            loop.create_task(self._worker(), name=f"summary-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self, drain_timeout: float = 0):
+        """
+        Stops the workers, optionally waiting up to drain_timeout seconds
+        for the queue to empty first.
+        """
+        deadline = time.monotonic() + drain_timeout
+
+        while (self._pending or self._in_flight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+        for task in self._tasks:
+            task.cancel()
+
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # -------- producer side --------
+
+    def submit(self, thread_id: str, job: SummaryJob):
+        """
+        Enqueues a summarization job for thread_id and returns immediately.
+        """
+        self.start()
+
+        existing = self._pending.get(thread_id)
+
+        if existing is not None:
+            existing.job = job
+            existing.attempts = 0
+            self.superseded += 1
+        else:
+            self._pending[thread_id] = _PendingJob(job=job, enqueued_at=time.time())
+
+        self._wakeup.set()
+
+    # -------- consumer side --------
+
+    def _next_job(self) -> tuple[str, _PendingJob] | None:
+        for thread_id in self._pending:
+            if thread_id not in self._in_flight:
+                return thread_id, self._pending.pop(thread_id)
+        return None
+
+    async def _worker(self):
+        while True:
+            item = self._next_job()
+
+            if item is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            thread_id, pending = item
+            self._in_flight.add(thread_id)
+            self.last_lag_seconds = time.time() - pending.enqueued_at
+
+            try:
+                await pending.job()
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._on_failure(thread_id, pending)
+            finally:
+                self._in_flight.discard(thread_id)
+                # A job for this thread may have been skipped while in flight
+                self._wakeup.set()
+
+    def _on_failure(self, thread_id: str, pending: _PendingJob):
+        pending.attempts += 1
+
+        if pending.attempts > self.max_retries or thread_id in self._pending:
+            self.failed += 1
+            logger.exception("Summarization failed for thread %s", thread_id)
+            return
+
+        self.retried += 1
+        self._loop.call_later(
+            self.retry_backoff_seconds * pending.attempts,
+            self._requeue, thread_id, pending
+        )
+
+    def _requeue(self, thread_id: str, pending: _PendingJob):
+        # A newer job submitted during the backoff wins
+        if thread_id not in self._pending:
+            self._pending[thread_id] = pending
+            self._wakeup.set()
+
+    # -------- observability --------
+
+    def stats(self) -> dict:
+        oldest = next(iter(self._pending.values()), None)
+
+        return {
+            "depth": len(self._pending),
+            "in_flight": len(self._in_flight),
+            "lag_seconds": time.time() - oldest.enqueued_at if oldest else 0.0,
+            "last_lag_seconds": self.last_lag_seconds,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "superseded": self.superseded,
+        }
+
+
+summary_queue = SummaryQueue(
+    workers=SUMMARY_WORKERS,
+    max_retries=SUMMARY_MAX_RETRIES,
+    retry_backoff_seconds=SUMMARY_RETRY_BACKOFF_SECONDS
+)
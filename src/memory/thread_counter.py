@@ -0,0 +1,91 @@
+import asyncio
+from collections import OrderedDict
+
+from src.config import single_worker_flag
+from src.db.storage import get_storage
+
+
+# =========================
+# CONFIG
+# =========================
+
+THREAD_COUNTER_MAX_THREADS = 10_000
+
+# Each worker would only count the turns it served; when off, every
+# turn reads the count from the database
+THREAD_COUNTER_CACHE_ENABLED = single_worker_flag("THREAD_COUNTER_CACHE_ENABLED")
+
+
+class ThreadCounter:
+    """
+    In-process message counter per thread.
+
+    The first time a thread is seen its count is seeded from
+    chat_threads.message_count (kept up to date by a database trigger);
+    after that every turn only adds to the cached value, so deciding
+    whether to summarize costs no query.
+
+    Per process: with enabled=False nothing is cached and record() always
+    reads the database count.
+    """
+
+    def __init__(self, max_threads: int, enabled: bool = True):
+        self.max_threads = max_threads
+        self.enabled = enabled
+        self._counts: OrderedDict[str, int] = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    async def _seed(self, thread_id: str) -> int:
+        return await get_storage().get_message_count(thread_id)
+
+    async def record(self, thread_id: str, added: int) -> tuple[int, int]:
+        """
+        Records `added` messages already inserted for thread_id and
+        returns (count_before, count_after).
+        """
+        if not self.enabled or thread_id not in self._counts:
+            # The seed already includes the rows just inserted
+            current = await self._seed(thread_id)
+
+            if not self.enabled:
+                return current - added, current
+
+            async with self._lock:
+                self._counts.setdefault(thread_id, current)
+                self._counts.move_to_end(thread_id)
+                current = self._counts[thread_id]
+
+                while len(self._counts) > self.max_threads:
+                    self._counts.popitem(last=False)
+
+            return current - added, current
+
+        async with self._lock:
+            before = self._counts.get(thread_id, 0)
+            self._counts[thread_id] = before + added
+            self._counts.move_to_end(thread_id)
+
+        return before, before + added
+
+    def prime(self, thread_id: str, count: int):
+        """
+        Seeds a thread from a count read elsewhere (e.g. the context
+        loader), before this turn's messages are recorded.
+        """
+        if self.enabled and thread_id not in self._counts:
+            self._counts[thread_id] = count
+
+            while len(self._counts) > self.max_threads:
+                self._counts.popitem(last=False)
+
+    def get(self, thread_id: str) -> int | None:
+        return self._counts.get(thread_id)
+
+    def forget(self, thread_id: str):
+        self._counts.pop(thread_id, None)
+
+
+thread_counter = ThreadCounter(
+    max_threads=THREAD_COUNTER_MAX_THREADS,
+    enabled=THREAD_COUNTER_CACHE_ENABLED
+)
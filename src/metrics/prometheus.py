@@ -0,0 +1,294 @@
+import bisect
+import contextvars
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# CONFIG
+# =========================
+
+# Log one line per request with the duration of every stage
+TRACE_REQUESTS = os.getenv("TRACE_REQUESTS", "0") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+
+# =========================
+# METRIC TYPES
+# =========================
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """
+    Monotonic counter with labels, rendered in Prometheus text format.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with labels, rendered in Prometheus text
+    format. observe() is safe to call from tool worker threads.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., +Inf count, sum]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {series[-1]}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+
+        return lines
+
+
+# =========================
+# REGISTRY
+# =========================
+
+_metrics: list = []
+_stats_sources: dict[str, Callable[[], dict]] = {}
+
+
+def counter(name: str, help: str, labelnames: tuple = ()) -> Counter:
+    metric = Counter(name, help, labelnames)
+    _metrics.append(metric)
+    return metric
+
+
+def histogram(name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+    metric = Histogram(name, help, labelnames, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+def register_stats(component: str, stats: Callable[[], dict]):
+    """
+    Exposes the numeric values of a component's stats() as gauges named
+    chat_<component>_<key>, read at scrape time.
+    """
+    _stats_sources[component] = stats
+
+
+def render() -> str:
+    """
+    All metrics of this process in Prometheus text format (0.0.4).
+
+    With API_WORKERS > 1 every worker keeps its own numbers, so a scrape
+    of /metrics describes the worker that answered it.
+    """
+    lines = []
+
+    for metric in _metrics:
+        lines.extend(metric.render())
+
+    for component, stats in _stats_sources.items():
+        try:
+            values = stats()
+        except Exception:
+            logger.exception("stats() of %s failed", component)
+            continue
+
+        for key, value in values.items():
+            if isinstance(value, bool):
+                value = int(value)
+            if not isinstance(value, (int, float)):
+                continue
+
+            name = re.sub(r"[^a-zA-Z0-9_]", "_", f"chat_{component}_{key}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+# =========================
+# HOT-PATH METRICS
+# =========================
+
+REQUEST_SECONDS = histogram(
+    "chat_request_seconds",
+    "End-to-end duration of a chat request",
+    ("handler", "status")
+)
+
+STAGE_SECONDS = histogram(
+    "chat_stage_seconds",
+    "Duration of one step of a chat request (handler steps and graph nodes)",
+    ("stage",)
+)
+
+TOOL_SECONDS = histogram(
+    "chat_tool_seconds",
+    "Duration of one tool call",
+    ("tool", "status")
+)
+
+LLM_TOKENS = histogram(
+    "chat_llm_tokens",
+    "Tokens per LLM call",
+    ("caller", "kind"),
+    buckets=TOKEN_BUCKETS
+)
+
+
+# =========================
+# TRACING
+# =========================
+
+_trace: contextvars.ContextVar[dict | None] = contextvars.ContextVar("chat_trace", default=None)
+
+
+def _add_to_trace(name: str, seconds: float):
+    trace = _trace.get()
+
+    if trace is not None:
+        trace["stages"].append([name, round(seconds * 1000, 1)])
+
+
+def record_stage(name: str, seconds: float):
+    """
+    Records a duration measured by the caller (e.g. time to first token).
+    """
+    STAGE_SECONDS.observe(seconds, stage=name)
+    _add_to_trace(name, seconds)
+
+
+@contextmanager
+def trace_request(handler: str, **fields):
+    """
+    Times one request and collects the stages run inside it; the trace
+    is logged as one JSON line when TRACE_REQUESTS is set.
+    """
+    trace = {"handler": handler, **fields, "stages": []}
+    token = _trace.set(trace)
+    start = time.perf_counter()
+    status = "ok"
+
+    try:
+        yield trace
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+
+        try:
+            _trace.reset(token)
+        except ValueError:
+            # Streaming generator closed from another context
+            pass
+
+        REQUEST_SECONDS.observe(elapsed, handler=handler, status=status)
+
+        if TRACE_REQUESTS:
+            trace["status"] = status
+            trace["total_ms"] = round(elapsed * 1000, 1)
+            logger.info("trace %s", json.dumps(trace, default=str))
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Times one step into chat_stage_seconds and the current trace.
+    """
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def record_tool(tool: str, seconds: float, status: str):
+    TOOL_SECONDS.observe(seconds, tool=tool, status=status)
+    _add_to_trace(f"tool:{tool}", seconds)
+
+
+def record_llm_usage(caller: str, message):
+    """
+    Records the token usage reported on an LLM response, if any.
+    """
+    usage = getattr(message, "usage_metadata", None)
+
+    if not usage:
+        return
+
+    for kind in ("input_tokens", "output_tokens"):
+        if usage.get(kind) is not None:
+            LLM_TOKENS.observe(usage[kind], caller=caller, kind=kind.removesuffix("_tokens"))
+
+    trace = _trace.get()
+    if trace is not None:
+        trace.setdefault("tokens", []).append(
+            [caller, usage.get("input_tokens"), usage.get("output_tokens")]
+        )
@@ -1,33 +1,59 @@
-from fastapi import APIRouter
-from fastapi.responses import StreamingResponse
-from src.handlers.chat_handler import chat_agent_handler, get_all_threads_handler, chat_history_handler
-from src.agents.chat_agent.states.chat_agent_state import ChatAgentState
-from fastapi.responses import StreamingResponse
+import hashlib
 import json
-import time
-from fastapi.responses import StreamingResponse
-from src.db.supabase_client import supabase
-from fastapi import Body
+
+from fastapi import APIRouter, Body, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+
+from src.handlers.chat_handler import chat_agent_handler, chat_streaming_handler, get_all_threads_handler, chat_history_handler, chat_history_db_handler, THREADS_PAGE_SIZE, THREADS_MAX_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE
+from src.agents.chat_agent.states.chat_agent_state import ChatAgentState
+from src.scheduling.thread_scheduler import thread_scheduler
+from src.scheduling.llm_scheduler import llm_scheduler, Priority
+from src.streaming.resumable_stream import stream_sessions, StreamSession, STREAM_RESUME_ENABLED
 
 
 router = APIRouter()
 
 
+# Ends a format="text" stream whose turn failed; the status code was
+# already sent as 200, so this is the only way to tell it from an answer
+STREAM_TEXT_ERROR_MARKER = "\n[error] "
+
+
+# Registered before /chat/{thread_id} so "feedback" is not taken as a thread id
+@router.post("/chat/feedback")
+async def chat_feedback(
+    message_id: int = Body(...),
+    approved: bool = Body(...)
+):
+    """
+    Approve / Reject an AI response
+    """
+    from src.handlers.chat_handler import mark_message_feedback
+    await mark_message_feedback(message_id, approved)
+    return {"status": "ok"}
+
+
 @router.post("/chat/{thread_id}")
-def chat_agent_route(thread_id: str, message: str)-> ChatAgentState:
+async def chat_agent_route(thread_id: str, message: str)-> ChatAgentState:
     """
     """
-    return chat_agent_handler(thread_id=thread_id, message=message)
+    return await chat_agent_handler(thread_id=thread_id, message=message)
 
 @router.get("/chat/threads")
-def get_all_threads() -> list[str | None]:
+async def get_all_threads(
+    limit: int = Query(THREADS_PAGE_SIZE, ge=1, le=THREADS_MAX_PAGE_SIZE),
+    cursor: str | None = None
+) -> dict:
     """
-    Docstring for get_all_threads
+    Lists threads, most recently active first.
+
+    Returns {"threads": [...], "next_cursor": ...}; pass next_cursor back
+    as `cursor` to get the following page.
     """
-    return get_all_threads_handler()
+    return await get_all_threads_handler(limit=limit, cursor=cursor)
 
 @router.post('/chat/{thread_id}')
-def chat_stream_route(thread_id: str, message: str) ->ChatAgentState:
+async def chat_stream_route(thread_id: str, message: str) ->ChatAgentState:
     """
     Docstring for chat_agent_route
     
@@ -39,70 +65,166 @@ def chat_stream_route(thread_id: str, message: str) ->ChatAgentState:
     :rtype: ChatAgentState
     """
 
-    return chat_agent_handler(thread_id=thread_id, message=message)
+    return await chat_agent_handler(thread_id=thread_id, message=message)
 
 
 @router.get('/chat/history/{thread_id}')
-def get_chat_history(thread_id: str) -> ChatAgentState | dict[None, None]:
+async def get_chat_history(thread_id: str) -> ChatAgentState | dict[None, None]:
     """
     Docstring for get_chat_history
     
     :param thread_id: Description
     :type thread_id: str
     """
-    return chat_history_handler(thread_id = thread_id)
+    return await chat_history_handler(thread_id = thread_id)
+
+
+
+def stream_response(request: Request, session: StreamSession, format: str, offset: int, kind: str) -> StreamingResponse:
+    """
+    Serves a stream session from `offset`: characters of the answer for
+    format="text", events already received for format="sse".
+
+    A failed turn ends a text stream with STREAM_TEXT_ERROR_MARKER and
+    the error message; SSE clients get an "error" event instead.
+    """
+    if format == "sse":
+        async def sse_generator():
+            async for i, event in session.read(request, start=offset, kind=kind):
+                # The id is what a reconnecting client sends back as Last-Event-ID
+                yield f"id: {i + 1}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+        return StreamingResponse(sse_generator(), media_type="text/event-stream")
+
+    async def text_generator():
+        position = 0
+
+        async for _, event in session.read(request, kind=kind):
+            if event["event"] == "error":
+                yield f"{STREAM_TEXT_ERROR_MARKER}{event['data']}"
+                return
+
+            if event["event"] != "token":
+                continue
+
+            text = event["data"]
 
+            if position + len(text) > offset:
+                yield text[max(0, offset - position):]
+
+            position += len(text)
+
+    return StreamingResponse(text_generator(), media_type="text/plain")
 
 
 @router.post("/chat/stream/{thread_id}")
-def chat_stream(thread_id: str, message: str):
+async def chat_stream(request: Request, thread_id: str, message: str, format: str = "text"):
+    """
+    Streams the assistant reply token by token while the graph runs.
+
+    format="text" sends raw text chunks (what the React app reads).
+    format="sse" sends Server-Sent Events, including tool progress.
+
+    The turn runs independently of this response: after a disconnect
+    it can be resumed via /chat/stream/{thread_id}/resume with the
+    X-Stream-Id response header, and it is cancelled (keeping the
+    partial answer) if nobody comes back. With
+    API_WORKERS > 1 resuming is disabled and a disconnect cancels the
+    turn right away.
+
+    If the turn fails after streaming started, format="text" ends with
+    STREAM_TEXT_ERROR_MARKER followed by the error message.
+    """
 
-    full_state = chat_agent_handler(thread_id=thread_id, message=message)
+    # Rejected with 429 / 503 here: once streaming starts the status is sent
+    thread_scheduler.check_admission(thread_id, message)
+    llm_scheduler.check_admission(Priority.STREAM)
 
-    # ----- Extract last message safely -----
-    if isinstance(full_state, dict):
-        last_obj = full_state["messages"][-1]
-        last_message = (
-            last_obj["content"] 
-            if isinstance(last_obj, dict) 
-            else last_obj.content
+    session = stream_sessions.start(
+        thread_id,
+        chat_streaming_handler(
+            request=request,
+            thread_id=thread_id,
+            message=message
         )
-    else:
-        last_message = full_state.messages[-1].content
-    # ---------------------------------------
+    )
 
-    def word_generator():
-        for word in last_message.split(" "):
-            time.sleep(0.08)          # <-- CRITICAL for visible streaming
-            yield word + " "
+    response = stream_response(request, session, format, offset=0, kind="new")
+    response.headers["X-Stream-Id"] = session.stream_id
+    return response
 
-    return StreamingResponse(word_generator(), media_type="text/plain")
 
+@router.get("/chat/stream/{thread_id}/resume")
+async def resume_chat_stream(
+    request: Request,
+    thread_id: str,
+    stream_id: str,
+    offset: int = Query(0, ge=0),
+    format: str = "text"
+):
+    """
+    Reattaches to a running (or just finished) streamed turn without
+    starting a new generation. stream_id is the X-Stream-Id header of
+    the response that started the turn.
 
+    offset is the number of characters already received (format="text")
+    or the last event id received (format="sse"; the Last-Event-ID header
+    works too).
 
-@router.get("/chat/history/db/{thread_id}")
-def get_chat_history_db(thread_id: str):
-    res = (
-    supabase
-    .table("chat_messages")
-    .select("sender, content, approved")
-    .eq("thread_id", thread_id)
-    .or_("approved.is.null,approved.eq.true")
-    .order("created_at")
-    .execute()
-)
+    Sessions are kept by the worker process that started the turn, so
+    this needs a single worker: with API_WORKERS > 1 it answers 409.
+    """
+    if not STREAM_RESUME_ENABLED:
+        raise HTTPException(
+            status_code=409,
+            detail="Stream resume is unavailable with multiple workers (API_WORKERS > 1)"
+        )
 
-    return res.data
+    session = stream_sessions.get(stream_id, thread_id)
 
+    if session is None:
+        raise HTTPException(status_code=404, detail="No stream to resume with this id")
 
-@router.post("/chat/feedback")
-def chat_feedback(
-    message_id: int = Body(...),
-    approved: bool = Body(...)
+    last_event_id = request.headers.get("last-event-id")
+    if format == "sse" and last_event_id and last_event_id.isdigit():
+        offset = int(last_event_id)
+
+    return stream_response(request, session, format, offset=offset, kind="resume")
+
+
+
+@router.get("/chat/history/db/{thread_id}")
+async def get_chat_history_db(
+    request: Request,
+    thread_id: str,
+    limit: int | None = Query(None, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    before: str | None = None,
+    after: str | None = None
 ):
     """
-    Approve / Reject an AI response
+    Persisted messages of a thread, oldest first.
+
+    Without parameters the whole thread is returned. With `limit` the
+    newest page is returned and the X-Next-Cursor header pages back via
+    `before`. `after` returns only newer messages; X-Sync-Cursor is the
+    value to pass as `after` on the next sync. Responses carry an ETag
+    and honour If-None-Match with 304 Not Modified.
     """
-    from src.handlers.chat_handler import mark_message_feedback
-    mark_message_feedback(message_id, approved)
-    return {"status": "ok"}
\ No newline at end of file
+    rows, cursor = await chat_history_db_handler(
+        thread_id=thread_id,
+        limit=limit,
+        before=before,
+        after=after
+    )
+
+    body = json.dumps(rows, separators=(",", ":"), default=str)
+    etag = f'W/"{hashlib.sha1(body.encode()).hexdigest()}"'
+
+    headers = {"ETag": etag}
+    if cursor is not None:
+        headers["X-Sync-Cursor" if after else "X-Next-Cursor"] = cursor
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
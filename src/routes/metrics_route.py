@@ -0,0 +1,43 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src.metrics import prometheus
+from src.agents.chat_agent.graph import checkpointer
+from src.agents.chat_agent.tools.web_search import search_cache
+from src.cache.response_cache import response_cache
+from src.db.write_behind import message_writer
+from src.memory.context_builder import context_builder
+from src.memory.context_loader import context_loader
+from src.memory.summary_queue import summary_queue
+from src.scheduling.thread_scheduler import thread_scheduler
+from src.scheduling.llm_scheduler import llm_scheduler
+from src.streaming.resumable_stream import stream_sessions
+
+
+router = APIRouter()
+
+
+# Component counters, read at scrape time
+prometheus.register_stats("context_cache", context_loader.stats)
+prometheus.register_stats("context_builder", context_builder.stats)
+prometheus.register_stats("write_behind", message_writer.stats)
+prometheus.register_stats("summary_queue", summary_queue.stats)
+prometheus.register_stats("web_search_cache", search_cache.stats)
+prometheus.register_stats("response_cache", response_cache.stats)
+prometheus.register_stats("thread_scheduler", thread_scheduler.stats)
+prometheus.register_stats("llm_scheduler", llm_scheduler.stats)
+prometheus.register_stats("stream_sessions", stream_sessions.stats)
+
+if hasattr(checkpointer, "stats"):
+    prometheus.register_stats("checkpointer", checkpointer.stats)
+
+
+@router.get("/metrics")
+async def metrics():
+    """
+    Prometheus scrape endpoint.
+    """
+    return PlainTextResponse(
+        prometheus.render(),
+        media_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,434 @@
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Callable
+
+from src.config import API_WORKERS
+from src.metrics import prometheus
+
+
+# =========================
+# CONFIG
+# =========================
+
+LLM_SCHEDULER_ENABLED = os.getenv("LLM_SCHEDULER_ENABLED", "1") == "1"
+
+# Token budget of the Groq account (~8k TPM); each worker's bucket
+# gets an equal share
+LLM_ACCOUNT_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "8000"))
+LLM_TOKENS_PER_MINUTE = max(1, LLM_ACCOUNT_TOKENS_PER_MINUTE // API_WORKERS)
+
+# Tokens one worker may spend at once after an idle period
+LLM_BURST_TOKENS = int(os.getenv("LLM_BURST_TOKENS", str(LLM_TOKENS_PER_MINUTE)))
+
+# Calls allowed to wait for tokens; more are shed, lowest priority first
+LLM_QUEUE_MAX = int(os.getenv("LLM_QUEUE_MAX", "32"))
+
+# Longest a call may wait for tokens before it fails
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "20"))
+
+# Reserved for the reply until the real usage is known
+LLM_OUTPUT_TOKENS_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKENS_ESTIMATE", "512"))
+
+
+class Priority(IntEnum):
+    """
+    Lower runs first.
+    """
+    STREAM = 0
+    CHAT = 1
+    SUMMARY = 2
+
+
+class LLMOverloadedError(RuntimeError):
+    """
+    Raised when an LLM call is shed: the queue is full or the wait for
+    tokens is too long. retry_after is a hint in seconds.
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+LLM_QUEUE_WAIT = prometheus.histogram(
+    "chat_llm_queue_wait_seconds",
+    "Time LLM calls waited for token budget",
+    ("priority",)
+)
+
+LLM_SCHEDULED_CALLS = prometheus.counter(
+    "chat_llm_scheduled_calls_total",
+    "LLM calls by priority and outcome (immediate, queued, rejected, evicted, timeout)",
+    ("priority", "outcome")
+)
+
+
+_priority: ContextVar[Priority] = ContextVar("llm_priority", default=Priority.CHAT)
+
+
+def current_priority() -> Priority:
+    return _priority.get()
+
+
+@contextmanager
+def llm_priority(priority: Priority):
+    """
+    Priority of the LLM calls made inside the block (e.g. by graph nodes).
+    """
+    token = _priority.set(priority)
+
+    try:
+        yield
+    finally:
+        try:
+            _priority.reset(token)
+        except ValueError:
+            # Streaming generator closed from another context
+            pass
+
+
+class TokenBucket:
+    """
+    Refills at rate tokens/second up to capacity. The level may go
+    negative when a call used more than it reserved; later calls then
+    wait for the debt to be paid back.
+    """
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.level = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, tokens: float) -> bool:
+        with self.lock:
+            self._refill()
+
+            if self.level >= tokens:
+                self.level -= tokens
+                return True
+
+            return False
+
+    def give(self, tokens: float):
+        """
+        Returns unused tokens (or, if negative, charges extra ones).
+        """
+        with self.lock:
+            self._refill()
+            self.level = min(self.capacity, self.level + tokens)
+
+    def time_until(self, tokens: float) -> float:
+        with self.lock:
+            self._refill()
+            return max(0.0, (tokens - self.level) / self.rate)
+
+    def available(self) -> float:
+        with self.lock:
+            self._refill()
+            return self.level
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    tokens: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class LLMCall:
+    """
+    Token reservation of one admitted call; settle() swaps the estimate
+    for the usage the provider reported.
+    """
+
+    def __init__(self, bucket: TokenBucket, reserved: int, input_tokens: int,
+        on_settle: Callable[[], None] | None = None):
+        self.bucket = bucket
+        self.reserved = reserved
+        self.input_tokens = input_tokens
+        self.on_settle = on_settle
+        self.settled = False
+
+    def settle(self, message=None):
+        if self.settled:
+            return
+
+        self.settled = True
+        usage = getattr(message, "usage_metadata", None)
+
+        if usage:
+            used = (usage.get("input_tokens") or 0) + (usage.get("output_tokens") or 0)
+        elif message is None:
+            # Failed call: assume the prompt was still counted
+            used = self.input_tokens
+        else:
+            return
+
+        self.bucket.give(self.reserved - used)
+
+        if self.on_settle is not None:
+            self.on_settle()
+
+
+class LLMScheduler:
+    """
+    Admission control for Groq calls, shared by chat_node and the
+    summarizer.
+
+    Each call reserves its estimated tokens (prompt + expected reply)
+    from a token bucket refilled at the tokens-per-minute limit, and
+    settles to the real usage afterwards. Calls that do not fit wait in
+    a priority queue: streamed chat first, then plain chat, summaries
+    last. When the queue is full the lowest-priority waiter is shed, and
+    a call that waits longer than queue_timeout fails; both raise
+    LLMOverloadedError instead of a burst of 429s from Groq.
+    """
+
+    def __init__(self, tokens_per_minute: int, burst_tokens: int,
+        max_queue: int, queue_timeout: float, enabled: bool = True):
+        self.bucket = TokenBucket(capacity=burst_tokens, rate=tokens_per_minute / 60)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.enabled = enabled
+
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._dispatcher: asyncio.Task | None = None
+
+    def _live_waiters(self) -> list[_Waiter]:
+        return [w for w in self._waiters if not w.future.done()]
+
+    def _overloaded(self, reason: str) -> LLMOverloadedError:
+        return LLMOverloadedError(
+            f"LLM is overloaded ({reason}), try again shortly",
+            # Time for the bucket to cover everything already queued
+            retry_after=max(1.0, self.bucket.time_until(
+                sum(w.tokens for w in self._live_waiters())
+            ))
+        )
+
+    def check_admission(self, priority: Priority):
+        """
+        Raises LLMOverloadedError if a call of this priority would be
+        rejected right now. Lets the streaming route answer 503 before
+        the response starts.
+        """
+        if not self.enabled:
+            return
+
+        waiting = self._live_waiters()
+
+        if len(waiting) >= self.max_queue and all(w.priority <= priority for w in waiting):
+            LLM_SCHEDULED_CALLS.inc(priority=priority.name.lower(), outcome="rejected")
+            raise self._overloaded("queue full")
+
+    async def _acquire(self, tokens: int, priority: Priority):
+        label = priority.name.lower()
+
+        if not self._live_waiters() and self.bucket.try_take(tokens):
+            LLM_SCHEDULED_CALLS.inc(priority=label, outcome="immediate")
+            LLM_QUEUE_WAIT.observe(0, priority=label)
+            return
+
+        waiting = self._live_waiters()
+
+        if len(waiting) >= self.max_queue:
+            worst = max(waiting)
+
+            if worst.priority <= priority:
+                LLM_SCHEDULED_CALLS.inc(priority=label, outcome="rejected")
+                raise self._overloaded("queue full")
+
+            # Make room by shedding the newest lowest-priority call
+            LLM_SCHEDULED_CALLS.inc(priority=Priority(worst.priority).name.lower(), outcome="evicted")
+            worst.future.set_exception(self._overloaded("shed for higher-priority work"))
+
+        waiter = _Waiter(priority, next(self._seq), tokens, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, waiter)
+        self._wake()
+
+        started = time.perf_counter()
+
+        try:
+            await asyncio.wait_for(waiter.future, self.queue_timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            future = waiter.future
+
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # The dispatcher handed us the tokens just as we gave up
+                self.bucket.give(tokens)
+                self._wake_waiters()
+
+            if isinstance(e, asyncio.CancelledError):
+                raise
+
+            LLM_SCHEDULED_CALLS.inc(priority=label, outcome="timeout")
+            raise self._overloaded(f"waited {self.queue_timeout:.0f}s for token budget") from None
+        finally:
+            waited = time.perf_counter() - started
+            LLM_QUEUE_WAIT.observe(waited, priority=label)
+            prometheus.record_stage("llm_queue", waited)
+
+        LLM_SCHEDULED_CALLS.inc(priority=label, outcome="queued")
+
+    def _wake(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        else:
+            self._wakeup.set()
+
+    def _wake_waiters(self):
+        # Returned tokens may let the head of the queue run sooner
+        if self._dispatcher is not None and not self._dispatcher.done():
+            self._wakeup.set()
+
+    async def _dispatch(self):
+        """
+        Hands tokens to the head of the queue as the bucket refills.
+        """
+        while self._waiters:
+            head = self._waiters[0]
+
+            if head.future.done():
+                heapq.heappop(self._waiters)
+                continue
+
+            if self.bucket.try_take(head.tokens):
+                heapq.heappop(self._waiters)
+                head.future.set_result(None)
+                continue
+
+            # Sleep until the head fits, or until a new (maybe more
+            # urgent) call or returned tokens change the picture
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.bucket.time_until(head.tokens))
+            except asyncio.TimeoutError:
+                pass
+
+    def _estimate(self, input_tokens: int, output_tokens: int | None) -> int:
+        tokens = input_tokens + (output_tokens if output_tokens is not None else LLM_OUTPUT_TOKENS_ESTIMATE)
+
+        # A call larger than the bucket could never run; let it drain it
+        return min(tokens, int(self.bucket.capacity))
+
+    @asynccontextmanager
+    async def call(self, input_tokens: int,
+        priority: Priority | None = None,
+        output_tokens: int | None = None):
+        """
+        Waits for token budget, then runs the block. Call settle(response)
+        on the yielded LLMCall once the response is known.
+        """
+        tokens = self._estimate(input_tokens, output_tokens)
+
+        if self.enabled:
+            await self._acquire(tokens, priority if priority is not None else current_priority())
+
+        if self.enabled:
+            llm_call = LLMCall(self.bucket, tokens, input_tokens, on_settle=self._wake_waiters)
+        else:
+            llm_call = LLMCall(self.bucket, 0, input_tokens)
+
+        try:
+            yield llm_call
+        except BaseException:
+            if self.enabled:
+                llm_call.settle(None)
+            raise
+        finally:
+            llm_call.settled = True
+
+    def try_reserve(self, input_tokens: int, output_tokens: int | None = None) -> LLMCall | None:
+        """
+        Reservation for an optional extra call (a hedge): taken only if
+        the bucket covers it right now and nobody is queued, otherwise
+        None. Never waits. The caller settles the returned LLMCall.
+        """
+        if not self.enabled:
+            return LLMCall(self.bucket, 0, input_tokens)
+
+        tokens = self._estimate(input_tokens, output_tokens)
+
+        if self._live_waiters() or not self.bucket.try_take(tokens):
+            return None
+
+        return LLMCall(self.bucket, tokens, input_tokens, on_settle=self._wake_waiters)
+
+    def charge(self, tokens: int):
+        """
+        Bills tokens spent outside a reservation (e.g. the prompt of a
+        failed attempt before a fallback); may leave the bucket in debt.
+        """
+        if self.enabled and tokens > 0:
+            self.bucket.give(-tokens)
+
+    @contextmanager
+    def call_blocking(self, input_tokens: int, output_tokens: int | None = None):
+        """
+        Sync variant for graph.invoke and the sync summarizer: sleeps until
+        the budget allows the call, without queueing by priority.
+        """
+        tokens = self._estimate(input_tokens, output_tokens)
+
+        if self.enabled:
+            deadline = time.monotonic() + self.queue_timeout
+
+            while not self.bucket.try_take(tokens):
+                delay = self.bucket.time_until(tokens)
+
+                if time.monotonic() + delay > deadline:
+                    raise self._overloaded(f"waited {self.queue_timeout:.0f}s for token budget")
+
+                time.sleep(delay)
+
+        llm_call = LLMCall(self.bucket, tokens if self.enabled else 0, input_tokens)
+
+        try:
+            yield llm_call
+        except BaseException:
+            if self.enabled:
+                llm_call.settle(None)
+            raise
+        finally:
+            llm_call.settled = True
+
+    def stats(self) -> dict:
+        waiting = self._live_waiters()
+
+        return {
+            "enabled": self.enabled,
+            "tokens_available": round(self.bucket.available()),
+            "waiting": len(waiting),
+            **{
+                f"waiting_{p.name.lower()}": sum(w.priority == p for w in waiting)
+                for p in Priority
+            },
+        }
+
+
+llm_scheduler = LLMScheduler(
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    burst_tokens=LLM_BURST_TOKENS,
+    max_queue=LLM_QUEUE_MAX,
+    queue_timeout=LLM_QUEUE_TIMEOUT_SECONDS,
+    enabled=LLM_SCHEDULER_ENABLED
+)
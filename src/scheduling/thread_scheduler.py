@@ -0,0 +1,266 @@
+import asyncio
+import hashlib
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from src.agents.chat_agent.checkpointer import CHECKPOINT_DB_PATH
+from src.config import API_WORKERS
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process thread lock
+    fcntl = None
+
+
+# =========================
+# CONFIG
+# =========================
+
+# Turns allowed to wait behind the active one on the same thread
+THREAD_QUEUE_MAX = int(os.getenv("THREAD_QUEUE_MAX", "4"))
+
+# Opt-in: a message identical to one already queued or running on the
+# thread waits for that turn's answer instead of calling the LLM again.
+# Off by default because a user may repeat a message on purpose
+THREAD_COALESCE_ENABLED = os.getenv("THREAD_COALESCE_ENABLED", "0") == "1"
+
+# The queue and coalescing are per worker. With API_WORKERS > 1 a turn
+# also takes a lock shared by all workers, next to the checkpoint DB,
+# so two workers never run turns of the same thread at once
+THREAD_LEASE_ENABLED = os.getenv("THREAD_LEASE_ENABLED", "1" if API_WORKERS > 1 else "0") == "1"
+THREAD_LEASE_PATH = os.getenv("THREAD_LEASE_PATH", f"{CHECKPOINT_DB_PATH}.threads.lock")
+
+# Longest a turn waits for another worker to finish the thread's turn
+THREAD_LEASE_TIMEOUT_SECONDS = float(os.getenv("THREAD_LEASE_TIMEOUT_SECONDS", "120"))
+THREAD_LEASE_POLL_SECONDS = 0.05
+
+# Lock slots in the lease file; thread ids hash onto one of them
+THREAD_LEASE_SLOTS = 1 << 20
+
+
+class ThreadBusyError(RuntimeError):
+    """
+    Raised when a thread already has THREAD_QUEUE_MAX turns waiting.
+    """
+
+
+@dataclass
+class _Slot:
+    lock: asyncio.Lock
+    users: int = 0  # active + waiting turns
+
+
+class ThreadLease:
+    """
+    Per-thread lock shared by worker processes: a POSIX record lock on
+    one byte of a common file, picked by hashing the thread id.
+
+    Record locks belong to the process, not the coroutine, so holders in
+    this process are counted and the byte is unlocked when the last one
+    leaves. Two threads sharing a byte only serialize across workers.
+    """
+
+    def __init__(self, path: str, slots: int, timeout: float, poll_seconds: float):
+        self.path = path
+        self.slots = slots
+        self.timeout = timeout
+        self.poll_seconds = poll_seconds
+
+        # Opened lazily, so each worker process gets its own descriptor
+        self._fd: int | None = None
+        self._held: dict[int, int] = {}
+
+    def _offset(self, thread_id: str) -> int:
+        digest = hashlib.blake2b(thread_id.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % self.slots
+
+    def _try_lock(self, offset: int) -> bool:
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, offset)
+        except (BlockingIOError, PermissionError):
+            return False
+
+        return True
+
+    async def acquire(self, thread_id: str) -> int:
+        """
+        Waits until no other worker runs a turn of thread_id. Raises
+        ThreadBusyError after timeout seconds.
+        """
+        offset = self._offset(thread_id)
+        deadline = time.monotonic() + self.timeout
+
+        while offset not in self._held and not self._try_lock(offset):
+            if time.monotonic() > deadline:
+                raise ThreadBusyError(f"Thread {thread_id} is busy in another worker")
+
+            await asyncio.sleep(self.poll_seconds)
+
+        self._held[offset] = self._held.get(offset, 0) + 1
+        return offset
+
+    def release(self, offset: int):
+        self._held[offset] -= 1
+
+        if self._held[offset] == 0:
+            del self._held[offset]
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, offset)
+
+
+class Turn:
+    """
+    One admitted turn. The leader runs it and publishes the answer; a
+    coalesced turn just carries the answer of the identical turn it
+    joined.
+    """
+
+    def __init__(self, future: asyncio.Future | None = None, answer: str | None = None):
+        self._future = future
+        self.answer = answer
+
+    @property
+    def coalesced(self) -> bool:
+        return self._future is None
+
+    def publish(self, answer: str):
+        """
+        Hands the final answer to every request coalesced into this turn.
+        """
+        self.answer = answer
+
+        if self._future is not None and not self._future.done():
+            self._future.set_result(answer)
+
+
+class ThreadScheduler:
+    """
+    One active turn per thread, so concurrent posts to the same thread
+    (double submits) never interleave their inserts, history reads and
+    checkpoint writes.
+
+    Turns queue FIFO behind the active one, up to max_queue; beyond that
+    ThreadBusyError is raised. With coalesce, a message identical to an
+    in-flight one joins it: one LLM call, same answer for all.
+
+    Queueing and coalescing only see this worker's turns; with a lease,
+    the active turn also holds the thread's ThreadLease, which keeps
+    other workers out.
+    """
+
+    def __init__(self, max_queue: int, coalesce: bool = True, lease: ThreadLease | None = None):
+        self.max_queue = max_queue
+        self.coalesce = coalesce
+        self.lease = lease
+
+        self._slots: dict[str, _Slot] = {}
+        self._inflight: dict[tuple[str, str], asyncio.Future] = {}
+
+        self.turns = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    def _key(self, thread_id: str, message: str) -> tuple[str, str]:
+        return thread_id, message.strip()
+
+    def check_admission(self, thread_id: str, message: str):
+        """
+        Raises ThreadBusyError if a new turn would be rejected. Lets the
+        streaming route answer 429 before the response starts.
+        """
+        if self.coalesce and self._key(thread_id, message) in self._inflight:
+            return
+
+        slot = self._slots.get(thread_id)
+
+        if slot is not None and slot.users > self.max_queue:
+            self.rejected += 1
+            raise ThreadBusyError(
+                f"Thread {thread_id} already has {slot.users - 1} messages waiting"
+            )
+
+    @asynccontextmanager
+    async def turn(self, thread_id: str, message: str):
+        key = self._key(thread_id, message)
+
+        while self.coalesce and key in self._inflight:
+            future = self._inflight[key]
+
+            try:
+                answer = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    # The turn we joined gave up without an answer: run our own
+                    continue
+                raise
+
+            self.coalesced += 1
+            yield Turn(answer=answer)
+            return
+
+        self.check_admission(thread_id, message)
+
+        slot = self._slots.get(thread_id)
+        if slot is None:
+            slot = self._slots[thread_id] = _Slot(lock=asyncio.Lock())
+
+        slot.users += 1
+        future = asyncio.get_running_loop().create_future()
+
+        if self.coalesce:
+            self._inflight[key] = future
+
+        try:
+            async with slot.lock:
+                offset = await self.lease.acquire(thread_id) if self.lease else None
+
+                try:
+                    self.turns += 1
+                    yield Turn(future)
+                finally:
+                    if offset is not None:
+                        self.lease.release(offset)
+
+            if not future.done():
+                future.cancel()
+        except BaseException as e:
+            if not future.done():
+                if isinstance(e, Exception):
+                    future.set_exception(e)
+                    # Retrieved here so an unjoined turn logs nothing
+                    future.exception()
+                else:
+                    future.cancel()
+            raise
+        finally:
+            slot.users -= 1
+            if slot.users == 0 and self._slots.get(thread_id) is slot:
+                del self._slots[thread_id]
+
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "active_threads": len(self._slots),
+            "waiting": sum(slot.users - 1 for slot in self._slots.values()),
+            "turns": self.turns,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+        }
+
+
+thread_scheduler = ThreadScheduler(
+    max_queue=THREAD_QUEUE_MAX,
+    coalesce=THREAD_COALESCE_ENABLED,
+    lease=ThreadLease(
+        THREAD_LEASE_PATH,
+        slots=THREAD_LEASE_SLOTS,
+        timeout=THREAD_LEASE_TIMEOUT_SECONDS,
+        poll_seconds=THREAD_LEASE_POLL_SECONDS
+    ) if THREAD_LEASE_ENABLED and fcntl is not None else None
+)
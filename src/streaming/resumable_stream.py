@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import os
+import uuid
+from typing import AsyncIterator
+
+from fastapi import Request
+
+from src.config import single_worker_flag
+from src.metrics import prometheus
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# CONFIG
+# =========================
+
+# Sessions live in the worker that started the turn and nothing routes
+# a resume back to it (the resume route answers 409 when off)
+STREAM_RESUME_ENABLED = single_worker_flag("STREAM_RESUME_ENABLED")
+
+# How long a turn keeps generating with no client attached, waiting for
+# a reconnect; also how long a finished stream stays resumable.
+# 0 cancels the turn as soon as the client disconnects
+STREAM_RESUME_GRACE_SECONDS = float(os.getenv(
+    "STREAM_RESUME_GRACE_SECONDS", "15" if STREAM_RESUME_ENABLED else "0"
+))
+
+# How often a reader checks for a disconnect while no event arrives
+# (e.g. during a web search)
+STREAM_DISCONNECT_POLL_SECONDS = 1.0
+
+
+STREAM_SESSIONS = prometheus.counter(
+    "chat_stream_sessions_total",
+    "Streamed turns by outcome (completed, cancelled, failed)",
+    ("outcome",)
+)
+
+STREAM_READERS = prometheus.counter(
+    "chat_stream_readers_total",
+    "Stream readers by kind (new, resume) and end (finished, disconnected)",
+    ("kind", "end")
+)
+
+
+class StreamSession:
+    """
+    One streamed turn, decoupled from the HTTP response that started it.
+
+    The events run on their own task into a buffer; responses read the
+    buffer from any offset, so a client that reconnects continues where
+    it left off instead of starting a new generation. When the last
+    reader disconnects the turn keeps going for grace_seconds; if nobody
+    reattaches it is cancelled, which stops graph.astream together with
+    the Groq request and pending tool calls: calls still queued on the
+    tool pool never start, and a web search stops at its cancellation
+    checkpoint (an HTTP request already sent finishes in its thread and
+    is dropped).
+    """
+
+    def __init__(self, thread_id: str, events: AsyncIterator[dict], grace_seconds: float, on_forget):
+        self.stream_id = uuid.uuid4().hex
+        self.thread_id = thread_id
+        self.grace_seconds = grace_seconds
+        self.on_forget = on_forget
+
+        self.events: list[dict] = []
+        self.done = False
+        self.readers = 0
+
+        self._changed = asyncio.Event()
+        self._timer: asyncio.TimerHandle | None = None
+        self.task = asyncio.create_task(self._run(events))
+
+    async def _run(self, events: AsyncIterator[dict]):
+        outcome = "completed"
+
+        try:
+            async for event in events:
+                self.events.append(event)
+                self._notify()
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception:
+            outcome = "failed"
+            logger.exception("Streamed turn failed for thread %s", self.thread_id)
+            self.events.append({"event": "error", "data": "The answer could not be completed"})
+        finally:
+            STREAM_SESSIONS.inc(outcome=outcome)
+            self.done = True
+            self._notify()
+
+            # Still resumable for a while, then dropped
+            self._schedule(self.on_forget)
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _schedule(self, callback):
+        if self._timer is not None:
+            self._timer.cancel()
+
+        self._timer = asyncio.get_running_loop().call_later(self.grace_seconds, callback, self)
+
+    def _attach(self):
+        self.readers += 1
+
+        if not self.done and self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _detach(self):
+        self.readers -= 1
+
+        if self.readers == 0 and not self.done:
+            self._schedule(StreamSession._expire)
+
+    def _expire(self):
+        if self.readers == 0 and not self.done:
+            self.task.cancel()
+
+    async def read(self, request: Request, start: int = 0, kind: str = "new") -> AsyncIterator[tuple[int, dict]]:
+        """
+        Yields (index, event) from event `start` on, following the turn
+        until it ends or the client disconnects.
+        """
+        self._attach()
+        end = "finished"
+
+        try:
+            i = start
+
+            while True:
+                while i < len(self.events):
+                    yield i, self.events[i]
+                    i += 1
+
+                if self.done:
+                    return
+
+                changed = self._changed
+
+                try:
+                    await asyncio.wait_for(changed.wait(), STREAM_DISCONNECT_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+                if await request.is_disconnected():
+                    end = "disconnected"
+                    return
+        except BaseException:
+            # Response cancelled or the socket closed mid-send
+            end = "disconnected"
+            raise
+        finally:
+            STREAM_READERS.inc(kind=kind, end=end)
+            self._detach()
+
+
+class StreamSessions:
+    """
+    Live streamed turns by stream id. A thread can have several at once
+    (a turn running and others queued behind it by ThreadScheduler), so
+    each turn gets its own id, which the client sends back to resume.
+
+    Per process: a session can only be resumed on the worker that
+    started it (see STREAM_RESUME_ENABLED).
+    """
+
+    def __init__(self, grace_seconds: float):
+        self.grace_seconds = grace_seconds
+        self._sessions: dict[str, StreamSession] = {}
+
+    def start(self, thread_id: str, events: AsyncIterator[dict]) -> StreamSession:
+        session = StreamSession(thread_id, events, self.grace_seconds, on_forget=self._forget)
+        self._sessions[session.stream_id] = session
+        return session
+
+    def get(self, stream_id: str, thread_id: str) -> StreamSession | None:
+        session = self._sessions.get(stream_id)
+        return session if session is not None and session.thread_id == thread_id else None
+
+    def _forget(self, session: StreamSession):
+        self._sessions.pop(session.stream_id, None)
+
+    async def cancel_all(self):
+        """
+        Cancels running turns (they save their partial answers) on shutdown.
+        """
+        running = [s.task for s in self._sessions.values() if not s.task.done()]
+
+        for task in running:
+            task.cancel()
+
+        await asyncio.gather(*running, return_exceptions=True)
+
+    def stats(self) -> dict:
+        sessions = list(self._sessions.values())
+
+        return {
+            "sessions": len(sessions),
+            "running": sum(not s.done for s in sessions),
+            "detached": sum(not s.done and s.readers == 0 for s in sessions),
+        }
+
+
+stream_sessions = StreamSessions(grace_seconds=STREAM_RESUME_GRACE_SECONDS)
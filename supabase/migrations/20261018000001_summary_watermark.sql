@@ -0,0 +1,7 @@
+-- High-water mark for incremental summaries.
+-- summarize_and_save folds only chat_messages with id > last_message_id
+-- into the stored summary and skips the LLM call when there are none.
+
+alter table chat_summaries
+    add column if not exists last_message_id bigint,
+    add column if not exists last_message_at timestamptz;
@@ -0,0 +1,40 @@
+-- Per-thread message counter maintained by the database on insert, so
+-- the summarization trigger never has to count(*) chat_messages.
+
+create table if not exists chat_threads (
+    thread_id text primary key,
+    message_count bigint not null default 0,
+    created_at timestamptz not null default now(),
+    last_activity_at timestamptz not null default now()
+);
+
+create or replace function chat_threads_on_message_insert()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into chat_threads (thread_id, message_count, last_activity_at)
+    values (new.thread_id, 1, now())
+    on conflict (thread_id) do update
+        set message_count = chat_threads.message_count + 1,
+            last_activity_at = now();
+
+    return new;
+end;
+$$;
+
+drop trigger if exists chat_messages_count_trigger on chat_messages;
+
+create trigger chat_messages_count_trigger
+    after insert on chat_messages
+    for each row
+    execute function chat_threads_on_message_insert();
+
+-- Backfill counters for threads that already have messages
+insert into chat_threads (thread_id, message_count, created_at, last_activity_at)
+select thread_id, count(*), min(created_at), max(created_at)
+from chat_messages
+group by thread_id
+on conflict (thread_id) do update
+    set message_count = excluded.message_count,
+        last_activity_at = excluded.last_activity_at;
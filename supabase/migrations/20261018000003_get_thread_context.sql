@@ -0,0 +1,33 @@
+-- One round trip for everything a chat turn needs to build its context:
+-- the rolling summary, the thread's message counter and the last
+-- p_limit messages (oldest first). Rejected answers are left out, the
+-- same way /chat/history/db hides them.
+
+create index if not exists chat_messages_thread_created_idx
+    on chat_messages (thread_id, created_at desc, id desc);
+
+create or replace function get_thread_context(p_thread_id text, p_limit int default 6)
+returns json
+language sql
+stable
+as $$
+    select json_build_object(
+        'summary', (
+            select summary from chat_summaries where thread_id = p_thread_id
+        ),
+        'message_count', coalesce((
+            select message_count from chat_threads where thread_id = p_thread_id
+        ), 0),
+        'messages', coalesce((
+            select json_agg(m order by m.created_at, m.id)
+            from (
+                select id, sender, content, created_at
+                from chat_messages
+                where thread_id = p_thread_id
+                  and approved is distinct from false
+                order by created_at desc, id desc
+                limit p_limit
+            ) m
+        ), '[]'::json)
+    );
+$$;
@@ -0,0 +1,41 @@
+-- Thread index for /chat/threads: title plus a recency index so a page
+-- of threads costs O(page size) instead of a scan of every checkpoint.
+
+alter table chat_threads
+    add column if not exists title text;
+
+create index if not exists chat_threads_recency_idx
+    on chat_threads (last_activity_at desc, thread_id desc);
+
+create or replace function chat_threads_on_message_insert()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into chat_threads (thread_id, message_count, last_activity_at, title)
+    values (
+        new.thread_id,
+        1,
+        now(),
+        case when new.sender = 'user' then left(new.content, 80) end
+    )
+    on conflict (thread_id) do update
+        set message_count = chat_threads.message_count + 1,
+            last_activity_at = now(),
+            title = coalesce(chat_threads.title, excluded.title);
+
+    return new;
+end;
+$$;
+
+-- Backfill titles from the first user message of each thread
+update chat_threads t
+set title = left(m.content, 80)
+from (
+    select distinct on (thread_id) thread_id, content
+    from chat_messages
+    where sender = 'user'
+    order by thread_id, created_at, id
+) m
+where m.thread_id = t.thread_id
+  and t.title is null;
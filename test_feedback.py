@@ -0,0 +1,63 @@
+"""
+Rejected answers must leave the LLM context, also in delta mode where
+turns only send the new message on top of the checkpoint.
+
+    python -m pytest test_feedback.py
+"""
+import asyncio
+import os
+import tempfile
+
+workdir = tempfile.mkdtemp(prefix="feedback-test-")
+os.environ["CHECKPOINTER_BACKEND"] = "memory"
+os.environ["STORAGE_BACKEND"] = "sqlite"
+os.environ["SQLITE_DB_PATH"] = os.path.join(workdir, "chat.sqlite")
+os.environ["GRAPH_INPUT_MODE"] = "delta"
+os.environ["LLM_HEDGE_ENABLED"] = "0"
+os.environ.setdefault("GROQ_API_KEY", "test")
+
+from benchmarks import fakes
+
+fakes.install(llm_latency_seconds=0, tokens_per_second=1e6, reply_tokens=5)
+
+from src.db.storage import get_storage
+from src.handlers.chat_handler import chat_agent_handler, mark_message_feedback
+
+
+prompts: list[list] = []
+_plan = fakes.FakeChatModel._plan
+
+
+def _recording_plan(self, messages):
+    prompts.append(list(messages))
+    return _plan(self, messages)
+
+
+fakes.FakeChatModel._plan = _recording_plan
+
+
+async def _rejected_answer_is_not_sent_again():
+    thread_id = "feedback-thread"
+
+    await chat_agent_handler(thread_id, "first question")
+    rows = await get_storage().list_messages(thread_id)
+    rejected = next(row for row in rows if row["sender"] == "bot")
+
+    await mark_message_feedback(rejected["id"], approved=False)
+
+    prompts.clear()
+    await chat_agent_handler(thread_id, "second question")
+
+    contents = [m.content for m in prompts[0]]
+    assert "first question" in contents
+    assert "second question" in contents
+    assert rejected["content"] not in contents
+
+
+def test_rejected_answer_is_not_sent_again():
+    asyncio.run(_rejected_answer_is_not_sent_again())
+
+
+if __name__ == "__main__":
+    test_rejected_answer_is_not_sent_again()
+    print("ok")